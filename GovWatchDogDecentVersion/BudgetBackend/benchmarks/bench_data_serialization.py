@@ -0,0 +1,68 @@
+"""
+Requests/sec and bytes on the wire for /api/data-shaped responses: the previous path
+(pydantic PaginatedResponse + response_model + stdlib json) against fast_json_response
+(model_construct + orjson + negotiated compression).
+
+    cd BudgetBackend && python -m benchmarks.bench_data_serialization [--items 100 1000 10000] [--requests 200]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+
+from utils.pagination import PaginatedResponse
+from utils.responses import fast_json_response
+
+def make_items(count: int) -> list:
+    items = []
+    for i in range(count):
+        date = f"{1900 + i // 12}-{i % 12 + 1:02d}-01"
+        value = i * 0.731
+        items.append({"date": date, "value": value, "years": [date], "values": [value]})
+    return items
+
+def build_app(items: list) -> FastAPI:
+    app = FastAPI()
+    page = {"total": len(items), "page": 1, "page_size": len(items), "total_pages": 1, "has_next": False, "has_previous": False}
+
+    @app.get("/before", response_model=PaginatedResponse)
+    async def before():
+        return PaginatedResponse(items=items, **page)
+
+    @app.get("/after")
+    async def after(request: Request):
+        return fast_json_response(request, PaginatedResponse.model_construct(items=items, **page))
+
+    return app
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int, accept_encoding: str):
+    headers = {"Accept-Encoding": accept_encoding}
+    await client.get(path, headers=headers)  # warm-up
+    wire_bytes = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path, headers=headers)
+        wire_bytes = response.num_bytes_downloaded
+    return requests / (time.perf_counter() - start), wire_bytes
+
+async def run(item_counts: list, requests: int):
+    print(f"{'items':>7} {'before req/s':>13} {'after req/s':>12} {'after (gzip) req/s':>19} {'before bytes':>13} {'after (gzip) bytes':>19}")
+    for count in item_counts:
+        transport = httpx.ASGITransport(app=build_app(make_items(count)))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            before_rps, before_bytes = await measure(client, "/before", requests, "identity")
+            after_rps, _ = await measure(client, "/after", requests, "identity")
+            compressed_rps, compressed_bytes = await measure(client, "/after", requests, "gzip, br")
+        print(f"{count:>7} {before_rps:>13.0f} {after_rps:>12.0f} {compressed_rps:>19.0f} {before_bytes:>13} {compressed_bytes:>19}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.items, args.requests))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Per-chart render time and peak Python memory: the previous pyplot path against
+the template-based renderer in services.graph_generator.
+
+    cd BudgetBackend && python -m benchmarks.bench_graph_render [--points 60] [--iterations 20]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from services.graph_generator import CHART_SPECS, GRAPH_DPI, render_chart
+
+def pyplot_render(graph_type: str, x_values: list, y_values: list, path: str):
+    """ The pyplot path generate_graph used before the template renderer """
+    spec = CHART_SPECS[graph_type]
+    plt.figure(figsize=(8, 5))
+    if spec["kind"] == "line":
+        plt.plot(x_values, y_values, marker='o', color=spec["color"])
+        plt.grid()
+    else:
+        plt.bar(x_values, y_values, color=spec["color"])
+        plt.grid(axis='y')
+    plt.title(spec["title"])
+    plt.xlabel(spec["xlabel"])
+    plt.ylabel(spec["ylabel"])
+    plt.savefig(path, format="png", dpi=GRAPH_DPI)
+    plt.close()
+
+def measure(render, graph_type: str, points: int, iterations: int, out_dir: str):
+    x_values = [str(2000 + i) for i in range(points)]
+    path = os.path.join(out_dir, f"{render.__name__}-{graph_type}.png")
+    render(graph_type, x_values, [float(i) for i in range(points)], path)  # warm-up
+
+    timings = []
+    tracemalloc.start()
+    for i in range(iterations):
+        y_values = [float((i + j) % 17) for j in range(points)]
+        start = time.perf_counter()
+        render(graph_type, x_values, y_values, path)
+        timings.append(time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=60)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'graph_type':<18} {'pyplot ms':>10} {'fast ms':>9} {'speedup':>8} {'pyplot peak KiB':>16} {'fast peak KiB':>14}")
+    with tempfile.TemporaryDirectory() as out_dir:
+        for graph_type in CHART_SPECS:
+            slow_time, slow_peak = measure(pyplot_render, graph_type, args.points, args.iterations, out_dir)
+            fast_time, fast_peak = measure(render_chart, graph_type, args.points, args.iterations, out_dir)
+            print(
+                f"{graph_type:<18} {slow_time * 1000:>10.1f} {fast_time * 1000:>9.1f} "
+                f"{slow_time / fast_time:>7.2f}x {slow_peak / 1024:>16.0f} {fast_peak / 1024:>14.0f}"
+            )
+
+if __name__ == "__main__":
+    main()
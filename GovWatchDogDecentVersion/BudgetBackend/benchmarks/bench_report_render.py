@@ -0,0 +1,107 @@
+"""
+Report render throughput for large table sections: the previous read-format-write path
+against the compiled, incremental renderer in services.report_builder.
+
+    cd BudgetBackend && python -m benchmarks.bench_report_render [--rows 1000 10000 100000] [--iterations 10]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from services.report_builder import CompiledTemplate
+
+TEMPLATE = """# {report_title}
+**Prepared by {user_name}** ({company_email})
+
+{report_content}
+
+## Charts
+{graph_paths}
+
+## Data Tables
+| Fiscal Year | Revenue | Expenses | Surplus/Deficit |
+|-------------|---------|----------|-----------------|
+{table_data}
+"""
+
+def make_rows(rows: int) -> list:
+    return [
+        {"Fiscal Year": str(1900 + i), "Revenue": f"{i}B", "Expenses": f"{i + 1}B", "Surplus/Deficit": "-1B"}
+        for i in range(rows)
+    ]
+
+def format_render(template_path: str, tables: list, out_path: str):
+    """ The path generate_markdown_report used before compiled templates """
+    with open(template_path, "r") as template_file:
+        report_template = template_file.read()
+    table_md = "\n".join([
+        f"| {row['Fiscal Year']} | {row['Revenue']} | {row['Expenses']} | {row['Surplus/Deficit']} |"
+        for row in tables
+    ])
+    filled_report = report_template.format(
+        report_title="Benchmark", report_content="Body", user_name="Bench",
+        company_email="bench@example.com", graph_paths="", table_data=table_md
+    )
+    with open(out_path, "w") as output_file:
+        output_file.write(filled_report)
+
+def compiled_render(template: CompiledTemplate, tables: list, out_path: str):
+    with open(out_path, "w") as output_file:
+        template.render(output_file, {
+            "report_title": "Benchmark", "report_content": "Body", "user_name": "Bench",
+            "company_email": "bench@example.com", "graph_paths": (),
+            "table_data": (
+                f"| {row['Fiscal Year']} | {row['Revenue']} | {row['Expenses']} | {row['Surplus/Deficit']} |"
+                for row in tables
+            ),
+        })
+
+def measure(render, iterations: int):
+    render()  # warm-up
+    timings = []
+    tracemalloc.start()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        template_path = os.path.join(out_dir, "template.md")
+        with open(template_path, "w") as template_file:
+            template_file.write(TEMPLATE)
+        out_path = os.path.join(out_dir, "report.md")
+        template = CompiledTemplate(TEMPLATE)
+
+        # Both paths must produce the same document
+        tables = make_rows(10)
+        format_render(template_path, tables, out_path)
+        with open(out_path) as f:
+            expected = f.read()
+        compiled_render(template, tables, out_path)
+        with open(out_path) as f:
+            assert f.read() == expected, "compiled template output differs from str.format"
+
+        print(f"{'rows':>8} {'format ms':>10} {'compiled ms':>12} {'speedup':>8} {'format peak KiB':>16} {'compiled peak KiB':>18}")
+        for rows in args.rows:
+            tables = make_rows(rows)
+            slow_time, slow_peak = measure(lambda: format_render(template_path, tables, out_path), args.iterations)
+            fast_time, fast_peak = measure(lambda: compiled_render(template, tables, out_path), args.iterations)
+            print(
+                f"{rows:>8} {slow_time * 1000:>10.2f} {fast_time * 1000:>12.2f} "
+                f"{slow_time / fast_time:>7.2f}x {slow_peak / 1024:>16.0f} {fast_peak / 1024:>18.0f}"
+            )
+
+if __name__ == "__main__":
+    main()
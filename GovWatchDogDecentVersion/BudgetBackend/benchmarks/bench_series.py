@@ -0,0 +1,51 @@
+"""
+Memory and transform time for N observations: the previous per-observation dicts built by
+fetch_economic_data against the columnar models.series.Series.
+
+    cd BudgetBackend && python -m benchmarks.bench_series [--points 1000000]
+"""
+import argparse
+import time
+import tracemalloc
+
+from models.series import Series
+
+def make_rows(points: int) -> list:
+    return [(f"{1000 + i // 365:04d}-{i // 31 % 12 + 1:02d}-{i % 28 + 1:02d}", i * 0.25) for i in range(points)]
+
+def dict_items(rows: list) -> list:
+    """ The transform fetch_economic_data used before Series """
+    return [{
+        "date": date,
+        "value": value,
+        "years": [date],
+        "values": [value]
+    } for date, value in rows]
+
+def measure(transform, rows: list):
+    start = time.perf_counter()
+    transform(rows)
+    elapsed = time.perf_counter() - start
+    # Retained size is measured in a separate, traced run so tracing does not skew the timing
+    tracemalloc.start()
+    result = transform(rows)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, retained
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.points)
+    dict_time, dict_bytes = measure(dict_items, rows)
+    series_time, series_bytes = measure(lambda r: Series.from_rows("gdp_growth", r), rows)
+    print(f"{'':<8} {'transform s':>12} {'retained MiB':>13}")
+    print(f"{'dicts':<8} {dict_time:>12.2f} {dict_bytes / 2**20:>13.1f}")
+    print(f"{'Series':<8} {series_time:>12.2f} {series_bytes / 2**20:>13.1f}")
+    print(f"{'ratio':<8} {dict_time / series_time:>11.1f}x {dict_bytes / series_bytes:>12.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,35 @@
-from fastapi import FastAPI, HTTPException, Query, Depends
+from fastapi import FastAPI, Query, Depends, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
-from fastapi.responses import JSONResponse
-from models.inputs import ReportRequest
-from models.outputs import ReportOutput
-from services.data_fetcher import DataFetcher
-from services.graph_generator import generate_graph
-from services.report_builder import generate_markdown_report
+from fastapi.responses import JSONResponse, StreamingResponse
+from models.inputs import ReportRequest, BatchDataRequest
+from models.outputs import ReportOutput, ChartSeries, JobStatus, BatchDataResponse
+from services.data_fetcher import DataFetcher, UPSTREAM_BASES
+from services.render_pool import RenderPool
+from services.graph_generator import REPORTS_DIR
+from services.derived_metrics import DerivedMetrics
+from services.datasets import DatasetCache
+from services.report_pipeline import build_report, stream_report
+from services.data_queries import load_data, resolve_batch
+from services.export import EXPORT_CHUNK_ROWS, EXPORT_FORMATS, encode_export
 from services.cache_manager import CacheManager
+from services.http_client import HttpClientPool
+from services.rate_limiter import RateLimiter
+from services.timeseries_store import TimeSeriesStore
+from services.completion_cache import CompletionCache
+from services.job_queue import ReportJobQueue
+from services.prefetch import Prefetcher
+from services.artifact_store import ArtifactStore
 from utils.validation import DataFilter, DateRangeFilter
 from utils.pagination import PaginationParams, PaginatedResponse
-from utils.errors import BaseAPIError, DatabaseError
-from typing import Optional, Dict, Any
-import os
-import openai
-from groq import Groq
+from utils.errors import BaseAPIError, DatabaseError, DataNotFoundError, ValidationError
+from utils.responses import fast_json_response
+from utils.http_cache import (
+    ContentAddressedStaticFiles, DATA_CACHE_CONTROL, IMMUTABLE_CACHE_CONTROL, NO_STORE,
+    make_etag, observation_datetime, validator_headers, not_modified_response
+)
+from typing import Optional, Union
+from datetime import datetime, timezone
 
 # Initialize FastAPI
 app = FastAPI(title="Canadian Financial Watchdog API")
@@ -28,23 +43,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Redis Cache on startup
+# Serve content-addressed chart images with strong ETags and long-lived caching
+app.mount("/reports", ContentAddressedStaticFiles(directory=REPORTS_DIR), name="reports")
+
+# Initialize caches, upstream HTTP pools, the chart render pool, report workers, prefetching and artifact GC on startup
 @app.on_event("startup")
 async def startup():
     CacheManager.initialize_cache()
+    await HttpClientPool.startup(UPSTREAM_BASES)
+    RenderPool.startup()
+    await ReportJobQueue.startup()
+    Prefetcher.startup()
+    ArtifactStore.startup()
 
-# Initialize AI Clients
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-openai.api_key = OPENAI_API_KEY
-
-def get_ai_client():
-    if OPENAI_API_KEY:
-        return "openai"
-    elif GROQ_API_KEY:
-        return Groq(api_key=GROQ_API_KEY)
-    else:
-        raise ValueError("No AI API key found. Set OPENAI_API_KEY or GROQ_API_KEY in the environment.")
+@app.on_event("shutdown")
+async def shutdown():
+    await Prefetcher.shutdown()
+    await ReportJobQueue.shutdown()
+    await ArtifactStore.shutdown()
+    await HttpClientPool.shutdown()
+    TimeSeriesStore.close()
+    CompletionCache.close()
+    await CacheManager.close()
+    RenderPool.shutdown()
 
 # Custom OpenAPI schema
 def custom_openapi():
@@ -67,7 +88,8 @@ app.openapi = custom_openapi
 async def api_error_handler(request, exc: BaseAPIError):
     return JSONResponse(
         status_code=exc.status_code,
-        content=exc.detail
+        content=exc.detail,
+        headers=exc.headers
     )
 
 @app.post(
@@ -81,85 +103,126 @@ async def api_error_handler(request, exc: BaseAPIError):
 async def generate_financial_report(
     request: ReportRequest,
     filter_params: DataFilter = Depends(),
-    pagination: PaginationParams = Depends()
+    pagination: PaginationParams = Depends(),
+    output: str = Query("images", regex="^(images|data)$", description="Render graph images, or return chart data for client-side rendering"),
+    max_points: Optional[int] = Query(None, ge=3, description="Downsample chart data to at most this many points")
 ):
     try:
-        # Fetch paginated financial and economic data
-        budget_data = await DataFetcher.get_budget_data(filter_params, pagination)
-        gdp_data = await DataFetcher.fetch_economic_data("gdp_growth", filter_params, pagination)
-        inflation_data = await DataFetcher.fetch_economic_data("inflation_rate", filter_params, pagination)
-        employment_data = await DataFetcher.fetch_economic_data("employment_growth", filter_params, pagination)
-        debt_to_gdp_data = await DataFetcher.fetch_economic_data("debt_to_gdp", filter_params, pagination)
-        bond_yields_data = await DataFetcher.fetch_economic_data("bond_yields", filter_params, pagination)
-
-        # Generate AI report content
-        ai_client = get_ai_client()
-        if ai_client == "openai":
-            report_content = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a financial analyst generating an in-depth financial report."},
-                    {"role": "user", "content": f"Generate a financial report analyzing budget data, GDP growth, inflation rates, employment trends, debt-to-GDP ratios, and bond yields for {request.government_level} - {request.province or 'Canada'}."}
-                ]
-            )["choices"][0]["message"]["content"]
-        else:
-            client = Groq(api_key=GROQ_API_KEY)
-            response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": "You are a financial analyst generating an in-depth financial report."},
-                    {"role": "user", "content": f"Generate a financial report analyzing budget data, GDP growth, inflation rates, employment trends, debt-to-GDP ratios, and bond yields for {request.government_level} - {request.province or 'Canada'}."}
-                ]
-            )
-            report_content = response.choices[0].message.content
-
-        # Generate graphs with absolute URLs
-        base_url = "https://budgetwatchdog-production.up.railway.app"
-        graphs = [
-            f"{base_url}{generate_graph('net_debt', {'years': budget_data.items[0]['years'], 'net_debt': budget_data.items[0]['net_debt']})}",
-            f"{base_url}{generate_graph('gdp_growth', {'years': gdp_data.items[0]['years'], 'gdp_growth': gdp_data.items[0]['values']})}",
-            f"{base_url}{generate_graph('inflation_rate', {'months': inflation_data.items[0]['months'], 'inflation_rate': inflation_data.items[0]['values']})}",
-            f"{base_url}{generate_graph('employment_growth', {'years': employment_data.items[0]['years'], 'employment_growth': employment_data.items[0]['values']})}",
-            f"{base_url}{generate_graph('debt_to_gdp', {'years': debt_to_gdp_data.items[0]['years'], 'debt_to_gdp': debt_to_gdp_data.items[0]['values']})}",
-            f"{base_url}{generate_graph('bond_yields', {'years': bond_yields_data.items[0]['years'], 'yields': bond_yields_data.items[0]['values']})}",
-        ]
-
-        # Generate tables
-        tables = [
-            {
-                "Fiscal Year": year,
-                "Revenue": f"{budget_data.items[0]['revenue'][i]}B",
-                "Expenses": f"{budget_data.items[0]['expenses'][i]}B",
-                "Surplus/Deficit": f"{budget_data.items[0]['deficit'][i]}B"
-            } for i, year in enumerate(budget_data.items[0]["years"])
-        ]
-
-        # Generate Markdown report
-        report_file = generate_markdown_report(
-            {
-                "report_title": f"Financial Report: {request.government_level} - {request.province or 'Canada'}",
-                "report_content": report_content,
-                "user_name": request.user_name,
-                "company_email": request.company_email,
-            },
-            graphs, tables
-        )
-
-        return ReportOutput(
-            file_path=f"{base_url}/reports/{os.path.basename(report_file)}",
-            graphs=graphs,
-            tables=tables
-        )
-
+        return await build_report(request, filter_params, pagination, output, max_points)
+    except BaseAPIError:
+        raise
     except Exception as e:
         raise DatabaseError(
             message="Failed to generate report",
             details={"error": str(e)}
         )
 
+@app.post(
+    "/generate-report/stream",
+    responses={
+        200: {"content": {"text/event-stream": {}}, "description": "Report progress as Server-Sent Events"},
+        400: {"description": "Invalid request parameters"}
+    }
+)
+async def stream_financial_report(
+    request: ReportRequest,
+    filter_params: DataFilter = Depends(),
+    pagination: PaginationParams = Depends(),
+    output: str = Query("images", regex="^(images|data)$", description="Render graph images, or return chart data for client-side rendering"),
+    max_points: Optional[int] = Query(None, ge=3, description="Downsample chart data to at most this many points")
+):
+    return StreamingResponse(
+        stream_report(request, filter_params, pagination, output, max_points),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post(
+    "/generate-report/jobs",
+    response_model=JobStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        400: {"description": "Invalid request parameters"}
+    }
+)
+async def submit_report_job(
+    request: ReportRequest,
+    filter_params: DataFilter = Depends(),
+    pagination: PaginationParams = Depends(),
+    output: str = Query("images", regex="^(images|data)$", description="Render graph images, or return chart data for client-side rendering"),
+    max_points: Optional[int] = Query(None, ge=3, description="Downsample chart data to at most this many points")
+):
+    """ Queue a report and return its job id at once; an identical queued or running job is reused """
+    return ReportJobQueue.submit(request, filter_params, pagination, output, max_points)
+
+@app.get(
+    "/jobs/{job_id}",
+    response_model=JobStatus,
+    responses={
+        404: {"description": "Job not found"}
+    }
+)
+async def get_report_job(
+    job_id: str,
+    response: Response,
+    wait: float = Query(0, ge=0, le=60, description="Seconds to wait for the job to finish before answering")
+):
+    response.headers["Cache-Control"] = NO_STORE
+    job = await ReportJobQueue.wait(job_id, wait)
+    if job is None:
+        raise DataNotFoundError(
+            message=f"Job '{job_id}' not found",
+            details={"job_id": job_id}
+        )
+    return job
+
+@app.get(
+    "/artifacts/{artifact_id}",
+    responses={
+        404: {"description": "Artifact not found"}
+    }
+)
+async def get_artifact(artifact_id: str, request: Request):
+    """ Stored report content, addressed by its SHA-256 """
+    artifact = ArtifactStore.get(artifact_id)
+    if artifact is not None:
+        # The ID is the content hash, so it doubles as a strong ETag
+        etag = f'"{artifact_id}"'
+        last_modified = datetime.fromtimestamp(artifact["created_at"], tz=timezone.utc)
+        not_modified = not_modified_response(request, etag, last_modified, IMMUTABLE_CACHE_CONTROL)
+        if not_modified is not None:
+            return not_modified
+    content = ArtifactStore.read(artifact_id) if artifact else None
+    if content is None:
+        raise DataNotFoundError(
+            message=f"Artifact '{artifact_id}' not found",
+            details={"artifact_id": artifact_id}
+        )
+    return StreamingResponse(
+        content,
+        media_type=artifact["content_type"],
+        headers={"Content-Length": str(artifact["size"]), **validator_headers(etag, last_modified, IMMUTABLE_CACHE_CONTROL)}
+    )
+
+@app.get(
+    "/artifacts/{artifact_id}/metadata",
+    responses={
+        404: {"description": "Artifact not found"}
+    }
+)
+async def get_artifact_metadata(artifact_id: str):
+    """ Creator, inputs and creation time of a stored report """
+    artifact = ArtifactStore.get(artifact_id)
+    if artifact is None:
+        raise DataNotFoundError(
+            message=f"Artifact '{artifact_id}' not found",
+            details={"artifact_id": artifact_id}
+        )
+    return artifact
+
 @app.get(
     "/api/data",
-    response_model=PaginatedResponse,
+    response_model=Union[PaginatedResponse, ChartSeries],
     responses={
         400: {"description": "Invalid request parameters"},
         404: {"description": "Data not found"},
@@ -167,11 +230,16 @@ async def generate_financial_report(
     }
 )
 async def get_api_data(
+    request: Request,
     government_level: str = Query(..., description="Province or Federal"),
     province: Optional[str] = Query(None, description="Specify province if applicable"),
     metric: str = Query(..., description="Specify the metric to fetch"),
     filter_params: DataFilter = Depends(),
-    pagination: PaginationParams = Depends()
+    pagination: PaginationParams = Depends(),
+    format: str = Query("items", regex="^(items|series)$", description="Paginated items, or the whole series as columnar chart data"),
+    max_points: Optional[int] = Query(None, ge=3, description="Downsample series output to at most this many points"),
+    transform: Optional[str] = Query(None, regex="^(pct_change|yoy|rolling_mean|cagr)$", description="Derive pct_change, yoy, rolling_mean or cagr from the metric"),
+    window: Optional[int] = Query(None, ge=1, le=120, description="Observations for rolling_mean, years for cagr")
 ):
     try:
         # Update filter params with query parameters
@@ -179,13 +247,111 @@ async def get_api_data(
         filter_params.province = province
         filter_params.metric = metric
 
-        return await DataFetcher.fetch_economic_data(
-            metric,
-            filter_params,
-            pagination
-        )
+        # Validators come from the stored series' version, so a 304 never builds the body
+        state = await DataFetcher.series_state(metric, filter_params, transform, window)
+        etag = make_etag(metric, sorted(request.query_params.multi_items()), state)
+        last_modified = observation_datetime(state["last_date"])
+        not_modified = not_modified_response(request, etag, last_modified, DATA_CACHE_CONTROL, vary="Accept-Encoding")
+        if not_modified is not None:
+            return not_modified
+        headers = validator_headers(etag, last_modified, DATA_CACHE_CONTROL)
+
+        # Items are normalized by DataFetcher already; encode them directly instead of re-validating
+        data = await load_data(metric, filter_params, pagination, format, max_points, transform, window)
+        return fast_json_response(request, data, headers)
+    except BaseAPIError:
+        # Bad cursors and filters stay 400s; throttled or unavailable upstreams keep their 429/503 and Retry-After
+        raise
     except Exception as e:
         raise DatabaseError(
             message="Failed to fetch data",
             details={"error": str(e)}
-        )
\ No newline at end of file
+        )
+
+@app.post(
+    "/api/data/batch",
+    response_model=BatchDataResponse,
+    responses={
+        422: {"description": "Invalid batch request"}
+    }
+)
+async def get_api_data_batch(request: Request, batch: BatchDataRequest):
+    """
+    Resolve several /api/data queries (metrics, provinces, date ranges) in one round-trip.
+    Each query succeeds or fails on its own; results come back in request order.
+    """
+    results = await resolve_batch(batch.queries)
+    return fast_json_response(request, results)
+
+@app.get(
+    "/api/export",
+    responses={
+        200: {"content": {"application/x-ndjson": {}, "text/csv": {}}, "description": "The series, streamed row by row"},
+        400: {"description": "Invalid request parameters"},
+        500: {"description": "Internal server error"}
+    }
+)
+async def export_data(
+    government_level: str = Query(..., description="Province or Federal"),
+    province: Optional[str] = Query(None, description="Specify province if applicable"),
+    metric: str = Query(..., description="Specify the metric to export"),
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    start_date: Optional[datetime] = Query(None, description="Only observations on or after this date"),
+    end_date: Optional[datetime] = Query(None, description="Only observations on or before this date"),
+    transform: Optional[str] = Query(None, regex="^(pct_change|yoy|rolling_mean|cagr)$", description="Derive pct_change, yoy, rolling_mean or cagr from the metric"),
+    window: Optional[int] = Query(None, ge=1, le=120, description="Observations for rolling_mean, years for cagr")
+):
+    """ A metric's full (date-filtered) history as NDJSON or CSV, streamed without a page size limit """
+    try:
+        filter_params = DataFilter(
+            government_level=government_level,
+            province=province,
+            metric=metric,
+            date_range=DateRangeFilter(start_date=start_date, end_date=end_date) if start_date or end_date else None
+        )
+    except ValueError as e:
+        raise ValidationError(
+            message="Invalid export parameters",
+            details={"error": str(e)}
+        )
+
+    # Resolve (and refresh) the series before the response starts, so errors get a proper status
+    chunks = await DataFetcher.series_chunks(metric, filter_params, transform, window, EXPORT_CHUNK_ROWS)
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        encode_export(metric, chunks, format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{metric}.{extension}"',
+            "Cache-Control": NO_STORE
+        }
+    )
+
+@app.get(
+    "/ready",
+    responses={
+        503: {"description": "Caches are not warm yet"}
+    }
+)
+async def get_readiness():
+    """ Readiness probe reporting warm-cache coverage of province x metric combinations """
+    readiness = Prefetcher.readiness()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if readiness["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=readiness
+    )
+
+@app.get("/metrics")
+async def get_metrics():
+    """ Internal counters for caches and upstream traffic """
+    return {
+        "cache": CacheManager.metrics(),
+        "upstream_requests": DataFetcher.upstream_stats(),
+        "upstreams": HttpClientPool.metrics(),
+        "rate_limits": RateLimiter.metrics(),
+        "completion_cache": CompletionCache.metrics(),
+        "report_jobs": ReportJobQueue.metrics(),
+        "artifacts": ArtifactStore.metrics(),
+        "derived_metrics": DerivedMetrics.metrics(),
+        "datasets": DatasetCache.metrics(),
+    }
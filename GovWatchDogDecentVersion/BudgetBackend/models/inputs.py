@@ -1,5 +1,9 @@
+import os
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
+from utils.validation import DateRangeFilter
+
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "50"))
 
 # Input Model
 class ReportRequest(BaseModel):
@@ -8,3 +12,24 @@ class ReportRequest(BaseModel):
     report_type: str = Field(..., description="Summary, Full Report, or Specific Section")
     user_name: str = Field(..., description="Your full name")
     company_email: EmailStr = Field(..., description="Your company email")
+    refresh_narrative: bool = Field(False, description="Regenerate the AI narrative instead of reusing a cached one")
+
+# One entry of a batch data request; mirrors the /api/data query parameters
+class DataQuery(BaseModel):
+    government_level: str = Field(..., description="Province or Federal")
+    province: Optional[str] = Field(None, description="Specify province if applicable")
+    metric: str = Field(..., description="budget, or an economic or derived metric")
+    date_range: Optional[DateRangeFilter] = Field(None, description="Only observations within this range")
+    format: str = Field("items", pattern="^(items|series)$", description="Paginated items, or the whole series as columnar chart data")
+    max_points: Optional[int] = Field(None, ge=3, description="Downsample series output to at most this many points")
+    transform: Optional[str] = Field(None, pattern="^(pct_change|yoy|rolling_mean|cagr)$", description="Derive pct_change, yoy, rolling_mean or cagr from the metric")
+    window: Optional[int] = Field(None, ge=1, le=120, description="Observations for rolling_mean, years for cagr")
+    page: int = Field(1, ge=1, description="Page number")
+    page_size: int = Field(10, ge=1, le=100, description="Items per page")
+    sort_by: Optional[str] = Field(None, description="Field to sort by")
+    sort_order: str = Field("asc", pattern="^(asc|desc)$", description="Sort order")
+    cursor: Optional[str] = Field(None, description="Opaque next_cursor from a previous page; takes precedence over page")
+    include_total: bool = Field(True, description="Count the matching items")
+
+class BatchDataRequest(BaseModel):
+    queries: List[DataQuery] = Field(..., min_length=1, max_length=BATCH_MAX_QUERIES, description="Queries to resolve, answered in the same order")
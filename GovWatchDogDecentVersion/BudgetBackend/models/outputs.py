@@ -1,8 +1,39 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Any, Dict, List, Optional
+
+# Columnar chart data for client-side rendering
+class ChartSeries(BaseModel):
+    graph_type: str = Field(..., description="Chart identifier, e.g. net_debt or inflation_rate")
+    title: str = Field(..., description="Chart title")
+    kind: str = Field(..., description="line or bar")
+    units: str = Field(..., description="Units of the y values")
+    x: List[Any] = Field(..., description="x values (years, months or sectors)")
+    y: List[float] = Field(..., description="y values")
+    total_points: int = Field(..., description="Number of points before downsampling")
 
 # Output Model
 class ReportOutput(BaseModel):
-    file_path: str = Field(..., description="Path to the generated Markdown file")
+    file_path: str = Field(..., description="URL of the generated Markdown report artifact")
     graphs: List[str] = Field(..., description="List of generated graph file paths")
     tables: List[dict] = Field(..., description="Generated tables for the report")
+    chart_data: Optional[List[ChartSeries]] = Field(None, description="Chart series, returned instead of graph images when output=data")
+    failed_sources: Dict[str, str] = Field(default_factory=dict, description="Data sources that could not be fetched, with the reason")
+
+# Report job status, returned by the job endpoints
+class JobStatus(BaseModel):
+    job_id: str = Field(..., description="Job identifier to poll")
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    created_at: float = Field(..., description="Unix time the job was submitted")
+    started_at: Optional[float] = Field(None, description="Unix time a worker picked the job up")
+    finished_at: Optional[float] = Field(None, description="Unix time the job finished")
+    result: Optional[ReportOutput] = Field(None, description="The report, once the job succeeded")
+    error: Optional[Dict[str, Any]] = Field(None, description="Error details, if the job failed")
+
+# One answer of a batch data request; exactly one of data and error is set
+class BatchDataResult(BaseModel):
+    status_code: int = Field(..., description="HTTP status the query would have had on its own")
+    data: Optional[Any] = Field(None, description="Paginated items or chart series, as /api/data returns them")
+    error: Optional[Dict[str, Any]] = Field(None, description="Error details, if the query failed")
+
+class BatchDataResponse(BaseModel):
+    results: List[BatchDataResult] = Field(..., description="One result per query, in request order")
@@ -0,0 +1,74 @@
+import hashlib
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Union
+import numpy as np
+
+# Metrics reported per month; every other metric is keyed by year in the public item shape
+MONTHLY_METRICS = {"inflation_rate"}
+
+_ROW_DTYPE = np.dtype([("date", "datetime64[D]"), ("value", np.float64)])
+
+class Series:
+    """
+    One metric's observations as two parallel NumPy columns: day-precision dates and float64 values.
+    Used internally in place of per-observation dicts; `to_items` produces the public JSON shape.
+    """
+
+    __slots__ = ("metric", "dates", "values")
+
+    def __init__(self, metric: str, dates: np.ndarray, values: np.ndarray):
+        self.metric = metric
+        self.dates = dates
+        self.values = values
+
+    @classmethod
+    def from_columns(cls, metric: str, dates: Sequence[str], values: Sequence[float]) -> "Series":
+        return cls(metric, np.array(dates, dtype="datetime64[D]"), np.array(values, dtype=np.float64))
+
+    @classmethod
+    def from_rows(cls, metric: str, rows: Iterable[Tuple[str, float]]) -> "Series":
+        """ Build from (date, value) rows as returned by TimeSeriesStore.query """
+        # One pass over the row tuples into a record array, then split into contiguous columns
+        records = np.fromiter(rows, dtype=_ROW_DTYPE)
+        return cls(metric, np.ascontiguousarray(records["date"]), np.ascontiguousarray(records["value"]))
+
+    @classmethod
+    def empty(cls, metric: str) -> "Series":
+        return cls(metric, np.empty(0, dtype="datetime64[D]"), np.empty(0, dtype=np.float64))
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index: Union[slice, Sequence[int], np.ndarray]) -> "Series":
+        """ Sub-series by slice, index array or boolean mask """
+        if isinstance(index, list):
+            index = np.asarray(index, dtype=np.intp)
+        return Series(self.metric, self.dates[index], self.values[index])
+
+    def __repr__(self) -> str:
+        return f"Series({self.metric!r}, {len(self)} points)"
+
+    @property
+    def period_key(self) -> str:
+        return "months" if self.metric in MONTHLY_METRICS else "years"
+
+    @property
+    def nbytes(self) -> int:
+        return self.dates.nbytes + self.values.nbytes
+
+    def date_labels(self) -> List[str]:
+        return np.datetime_as_string(self.dates, unit="D").tolist()
+
+    def fingerprint(self) -> str:
+        """ Content hash of the metric and both columns """
+        digest = hashlib.sha256(self.metric.encode())
+        digest.update(self.dates.tobytes())
+        digest.update(self.values.tobytes())
+        return digest.hexdigest()
+
+    def to_items(self) -> List[Dict[str, Any]]:
+        """ Public item shape: one dict per observation with single-element period and value lists """
+        period_key = self.period_key
+        return [
+            {"date": date, "value": value, period_key: [date], "values": [value]}
+            for date, value in zip(self.date_labels(), self.values.tolist())
+        ]
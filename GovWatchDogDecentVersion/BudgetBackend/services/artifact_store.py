@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, TextIO
+
+ARTIFACT_BACKEND = os.getenv("ARTIFACT_BACKEND", "local")
+ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR", "data/artifacts")
+ARTIFACTS_DB_PATH = os.getenv("ARTIFACTS_DB_PATH", "data/artifacts.db")
+# Retention: artifacts unused for longer than this are removed, then the least recently used beyond the size bound
+ARTIFACT_MAX_AGE = int(os.getenv("ARTIFACT_MAX_AGE", str(30 * 24 * 3600)))
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(512 * 1024 * 1024)))
+ARTIFACT_GC_INTERVAL = int(os.getenv("ARTIFACT_GC_INTERVAL", "3600"))
+ARTIFACT_CHUNK_SIZE = 64 * 1024
+
+class ArtifactBackend(ABC):
+    """ Where artifact bytes live; metadata is kept by ArtifactStore """
+
+    @abstractmethod
+    def staging_dir(self) -> str:
+        """ Local directory for files being written before they are stored """
+
+    @abstractmethod
+    def put_file(self, key: str, src_path: str):
+        """ Take ownership of the local file at `src_path` and store it as `key` """
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+class LocalArtifactBackend(ArtifactBackend):
+    """ Artifacts as files under one directory """
+
+    def __init__(self, root: str = ARTIFACTS_DIR):
+        self.root = root
+        os.makedirs(self.staging_dir(), exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def staging_dir(self) -> str:
+        return os.path.join(self.root, ".staging")
+
+    def put_file(self, key: str, src_path: str):
+        shutil.move(src_path, self._path(key))
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+ARTIFACT_BACKENDS = {"local": LocalArtifactBackend}
+
+class _HashingWriter:
+    """ Text stream that hashes and counts the encoded bytes as they are written """
+
+    def __init__(self, raw: BinaryIO):
+        self.raw = raw
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8")
+        self.digest.update(data)
+        self.size += len(data)
+        self.raw.write(data)
+        return len(text)
+
+class ArtifactStore:
+    """ Content-addressed artifacts: the ID is the SHA-256 of the bytes, so identical reports are stored once """
+
+    _backend: Optional[ArtifactBackend] = None
+    _conn: Optional[sqlite3.Connection] = None
+    _lock = threading.Lock()
+    _gc_task: Optional[asyncio.Task] = None
+    stats = {"stored": 0, "deduplicated": 0, "collected": 0}
+
+    @classmethod
+    def backend(cls) -> ArtifactBackend:
+        if cls._backend is None:
+            cls._backend = ARTIFACT_BACKENDS[ARTIFACT_BACKEND]()
+        return cls._backend
+
+    @classmethod
+    def configure(cls, backend: ArtifactBackend):
+        """ Plug in another storage backend """
+        cls._backend = backend
+
+    @classmethod
+    def connection(cls) -> sqlite3.Connection:
+        if cls._conn is None:
+            with cls._lock:
+                if cls._conn is None:
+                    directory = os.path.dirname(ARTIFACTS_DB_PATH)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    conn = sqlite3.connect(ARTIFACTS_DB_PATH, check_same_thread=False, isolation_level=None)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.row_factory = sqlite3.Row
+                    conn.execute(
+                        """CREATE TABLE IF NOT EXISTS artifacts (
+                            id TEXT PRIMARY KEY,
+                            key TEXT NOT NULL,
+                            content_type TEXT NOT NULL,
+                            size INTEGER NOT NULL,
+                            creator TEXT,
+                            inputs TEXT,
+                            created_at REAL NOT NULL,
+                            last_used_at REAL NOT NULL
+                        )"""
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS artifacts_last_used ON artifacts (last_used_at)")
+                    cls._conn = conn
+        return cls._conn
+
+    @classmethod
+    def startup(cls):
+        if cls._gc_task is None:
+            cls._gc_task = asyncio.create_task(cls._gc_loop())
+
+    @classmethod
+    async def shutdown(cls):
+        if cls._gc_task is not None:
+            cls._gc_task.cancel()
+            await asyncio.gather(cls._gc_task, return_exceptions=True)
+            cls._gc_task = None
+        with cls._lock:
+            if cls._conn is not None:
+                cls._conn.close()
+                cls._conn = None
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "content_type": row["content_type"],
+            "size": row["size"],
+            "creator": row["creator"],
+            "inputs": json.loads(row["inputs"]) if row["inputs"] else None,
+            "created_at": row["created_at"],
+        }
+
+    @classmethod
+    def put(
+        cls,
+        write: Callable[[TextIO], None],
+        extension: str,
+        content_type: str,
+        creator: Optional[str] = None,
+        inputs: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """ Store the text `write(out)` produces, hashing it as it streams; an identical artifact is reused """
+        backend = cls.backend()
+        fd, tmp_path = tempfile.mkstemp(dir=backend.staging_dir(), suffix=extension)
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                out = _HashingWriter(raw)
+                write(out)
+            artifact_id = out.digest.hexdigest()
+            key = f"{artifact_id}{extension}"
+            now = time.time()
+
+            conn = cls.connection()
+            with cls._lock:
+                row = conn.execute("SELECT * FROM artifacts WHERE id = ?", (artifact_id,)).fetchone()
+                if row is not None and backend.exists(key):
+                    conn.execute("UPDATE artifacts SET last_used_at = ? WHERE id = ?", (now, artifact_id))
+                    cls.stats["deduplicated"] += 1
+                    return cls._to_dict(row)
+                backend.put_file(key, tmp_path)
+                conn.execute(
+                    "INSERT OR REPLACE INTO artifacts (id, key, content_type, size, creator, inputs, created_at, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (artifact_id, key, content_type, out.size, creator, json.dumps(inputs, default=str) if inputs is not None else None, now, now)
+                )
+                cls.stats["stored"] += 1
+                return cls._to_dict(conn.execute("SELECT * FROM artifacts WHERE id = ?", (artifact_id,)).fetchone())
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def get(cls, artifact_id: str) -> Optional[Dict[str, Any]]:
+        row = cls.connection().execute("SELECT * FROM artifacts WHERE id = ?", (artifact_id,)).fetchone()
+        return cls._to_dict(row) if row else None
+
+    @classmethod
+    def read(cls, artifact_id: str) -> Optional[Iterator[bytes]]:
+        """ Artifact bytes in chunks, or None if it does not exist (or was collected) """
+        conn = cls.connection()
+        row = conn.execute("SELECT key FROM artifacts WHERE id = ?", (artifact_id,)).fetchone()
+        if row is None or not cls.backend().exists(row["key"]):
+            return None
+        conn.execute("UPDATE artifacts SET last_used_at = ? WHERE id = ?", (time.time(), artifact_id))
+        handle = cls.backend().open(row["key"])
+
+        def chunks() -> Iterator[bytes]:
+            with handle:
+                while True:
+                    chunk = handle.read(ARTIFACT_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+        return chunks()
+
+    @classmethod
+    def collect(cls) -> int:
+        """ Remove artifacts past ARTIFACT_MAX_AGE, then the least recently used until under ARTIFACT_MAX_BYTES """
+        conn = cls.connection()
+        backend = cls.backend()
+        removed = 0
+        cutoff = time.time() - ARTIFACT_MAX_AGE
+        with cls._lock:
+            victims = conn.execute("SELECT id, key FROM artifacts WHERE last_used_at < ?", (cutoff,)).fetchall()
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts WHERE last_used_at >= ?", (cutoff,)).fetchone()[0]
+            if total > ARTIFACT_MAX_BYTES:
+                for row in conn.execute(
+                    "SELECT id, key, size FROM artifacts WHERE last_used_at >= ? ORDER BY last_used_at", (cutoff,)
+                ).fetchall():
+                    if total <= ARTIFACT_MAX_BYTES:
+                        break
+                    victims.append(row)
+                    total -= row["size"]
+            for row in victims:
+                backend.delete(row["key"])
+                conn.execute("DELETE FROM artifacts WHERE id = ?", (row["id"],))
+                removed += 1
+        cls.stats["collected"] += removed
+        return removed
+
+    @classmethod
+    async def _gc_loop(cls):
+        while True:
+            try:
+                removed = await asyncio.to_thread(cls.collect)
+                if removed:
+                    logging.info(f"Artifact GC removed {removed} artifacts")
+            except Exception as e:
+                logging.error(f"Artifact GC failed: {e}")
+            await asyncio.sleep(ARTIFACT_GC_INTERVAL)
+
+    @classmethod
+    def metrics(cls) -> Dict[str, Any]:
+        count, size = cls.connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        return {**cls.stats, "artifacts": count, "bytes": size, "backend": ARTIFACT_BACKEND}
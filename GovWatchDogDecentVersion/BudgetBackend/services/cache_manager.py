@@ -1,10 +1,226 @@
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
-import redis
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from utils.singleflight import SingleFlight
+import redis.asyncio as redis
+import asyncio
+import json
+import logging
+import os
+import time
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_PREFIX = "financial_watchdog"
+L1_CACHE_MAX_ENTRIES = int(os.getenv("L1_CACHE_MAX_ENTRIES", "1024"))
+CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", "1800"))
+# How long past expiry a stale L1 entry may be served while one caller refreshes it
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", "300"))
+# Cross-worker recompute lock; other workers poll Redis for the value while it is held
+CACHE_LOCK_TTL = float(os.getenv("CACHE_LOCK_TTL", "30"))
+CACHE_LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT", "10"))
+STALE_KEY_PREFIX = "stale"
+
+class LRUCache:
+    """ Bounded in-process cache with per-entry expiry and least-recently-used eviction """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """ Return (value, expires_at), including expired entries still in the stale window """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] + CACHE_STALE_TTL < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, value: Any, ttl: int):
+        self._entries[key] = (value, time.time() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
 class CacheManager:
+    """ Two-tier cache: in-process LRU (L1) in front of Redis (L2), with single-flight recompute """
+
+    redis_client: Optional[redis.Redis] = None
+    l1 = LRUCache(L1_CACHE_MAX_ENTRIES)
+    # Last good values of keys loaded with stale_if_error, kept past their TTL for loader failures
+    last_good = LRUCache(L1_CACHE_MAX_ENTRIES)
+    _flight = SingleFlight()
+    _refreshing: Dict[str, asyncio.Task] = {}
+    stats = {"l1_hits": 0, "l1_stale_hits": 0, "l2_hits": 0, "misses": 0, "l2_errors": 0, "stale_if_error": 0}
 
     @staticmethod
     def initialize_cache():
-        redis_client = redis.Redis(host="localhost", port=6379, db=0)
-        FastAPICache.init(RedisBackend(redis_client), prefix="financial_watchdog")
+        CacheManager.redis_client = redis.from_url(REDIS_URL)
+        FastAPICache.init(RedisBackend(CacheManager.redis_client), prefix=CACHE_PREFIX)
+
+    @staticmethod
+    async def close():
+        if CacheManager.redis_client is not None:
+            await CacheManager.redis_client.aclose()
+            CacheManager.redis_client = None
+
+    @staticmethod
+    async def _l2_get(key: str) -> Optional[Any]:
+        if CacheManager.redis_client is None:
+            return None
+        try:
+            raw = await CacheManager.redis_client.get(f"{CACHE_PREFIX}:{key}")
+        except Exception as e:
+            CacheManager.stats["l2_errors"] += 1
+            logging.warning(f"Redis get failed for {key}: {e}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    @staticmethod
+    async def _l2_set(key: str, value: Any, ttl: int):
+        if CacheManager.redis_client is None:
+            return
+        try:
+            await CacheManager.redis_client.set(f"{CACHE_PREFIX}:{key}", json.dumps(value), ex=ttl)
+        except Exception as e:
+            CacheManager.stats["l2_errors"] += 1
+            logging.warning(f"Redis set failed for {key}: {e}")
+
+    @staticmethod
+    async def _acquire_lock(key: str) -> bool:
+        """ Take the cross-worker recompute lock; without Redis every worker is its own leader """
+        if CacheManager.redis_client is None:
+            return True
+        try:
+            return bool(await CacheManager.redis_client.set(
+                f"{CACHE_PREFIX}:lock:{key}", "1", nx=True, px=int(CACHE_LOCK_TTL * 1000)
+            ))
+        except Exception:
+            CacheManager.stats["l2_errors"] += 1
+            return True
+
+    @staticmethod
+    async def _release_lock(key: str):
+        if CacheManager.redis_client is None:
+            return
+        try:
+            await CacheManager.redis_client.delete(f"{CACHE_PREFIX}:lock:{key}")
+        except Exception:
+            CacheManager.stats["l2_errors"] += 1
+
+    @staticmethod
+    async def _store(key: str, value: Any, ttl: int, stale_if_error: int):
+        CacheManager.l1.set(key, value, ttl)
+        await CacheManager._l2_set(key, value, ttl)
+        if stale_if_error:
+            CacheManager.last_good.set(key, value, ttl + stale_if_error)
+            await CacheManager._l2_set(f"{STALE_KEY_PREFIX}:{key}", value, ttl + stale_if_error)
+
+    @staticmethod
+    async def _last_good(key: str) -> Optional[Any]:
+        entry = CacheManager.last_good.get(key)
+        if entry is not None:
+            return entry[0]
+        return await CacheManager._l2_get(f"{STALE_KEY_PREFIX}:{key}")
+
+    @staticmethod
+    async def _load(key: str, loader: Callable[[], Awaitable[Any]], ttl: int, stale_if_error: int = 0) -> Any:
+        """ Fill L1 from Redis, or recompute once across workers and write through both tiers """
+        value = await CacheManager._l2_get(key)
+        if value is not None:
+            CacheManager.stats["l2_hits"] += 1
+            CacheManager.l1.set(key, value, ttl)
+            return value
+
+        locked = await CacheManager._acquire_lock(key)
+        if not locked:
+            # Another worker is recomputing; wait for it to publish the value
+            deadline = time.time() + CACHE_LOCK_WAIT
+            while time.time() < deadline:
+                await asyncio.sleep(0.05)
+                value = await CacheManager._l2_get(key)
+                if value is not None:
+                    CacheManager.stats["l2_hits"] += 1
+                    CacheManager.l1.set(key, value, ttl)
+                    return value
+
+        CacheManager.stats["misses"] += 1
+        try:
+            value = await loader()
+            await CacheManager._store(key, value, ttl, stale_if_error)
+            return value
+        except Exception as e:
+            # An unreachable upstream (or an open breaker) serves the last good value instead of failing
+            value = await CacheManager._last_good(key) if stale_if_error else None
+            if value is None:
+                raise
+            CacheManager.stats["stale_if_error"] += 1
+            logging.warning(f"Loading {key} failed, serving the last good value: {e}")
+            return value
+        finally:
+            if locked:
+                await CacheManager._release_lock(key)
+
+    @staticmethod
+    async def _refresh(key: str, loader: Callable[[], Awaitable[Any]], ttl: int, stale_if_error: int = 0):
+        """ Renew a stale L1 entry from Redis, or recompute it if no other worker is already doing so """
+        locked = False
+        try:
+            value = await CacheManager._l2_get(key)
+            if value is not None:
+                # Another worker has refreshed it already
+                CacheManager.stats["l2_hits"] += 1
+                CacheManager.l1.set(key, value, ttl)
+                return
+            locked = await CacheManager._acquire_lock(key)
+            if not locked:
+                # Another worker is recomputing; keep serving the stale value until it reaches Redis
+                return
+            value = await loader()
+            await CacheManager._store(key, value, ttl, stale_if_error)
+        except Exception as e:
+            logging.warning(f"Background refresh of {key} failed, keeping stale value: {e}")
+        finally:
+            if locked:
+                await CacheManager._release_lock(key)
+            CacheManager._refreshing.pop(key, None)
+
+    @staticmethod
+    async def get_or_load(
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = CACHE_DEFAULT_TTL,
+        stale_if_error: int = 0
+    ) -> Any:
+        """
+        Return the cached value for `key`, computing it with `loader` on a miss.
+        Values must be JSON-serializable. Concurrent misses share one `loader` call,
+        and an expired entry is served stale while a single background task refreshes it.
+        With stale_if_error, the last good value is kept that many seconds past its TTL
+        and served when `loader` fails.
+        """
+        entry = CacheManager.l1.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at >= time.time():
+                CacheManager.stats["l1_hits"] += 1
+                return value
+            CacheManager.stats["l1_stale_hits"] += 1
+            if key not in CacheManager._refreshing:
+                CacheManager._refreshing[key] = asyncio.create_task(CacheManager._refresh(key, loader, ttl, stale_if_error))
+            return value
+
+        return await CacheManager._flight.do(key, lambda: CacheManager._load(key, loader, ttl, stale_if_error))
+
+    @staticmethod
+    def metrics() -> Dict[str, Any]:
+        return {**CacheManager.stats, "l1_entries": len(CacheManager.l1), **CacheManager._flight.stats()}
@@ -0,0 +1,65 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Union
+from models.series import Series
+from services.graph_generator import CHART_SPECS, chart_columns
+
+def lttb_indices(values: Sequence[float], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets downsampling: indices of `threshold` points that keep
+    the visual shape of the series. Points are treated as evenly spaced on the x axis.
+    """
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    xs = np.arange(n, dtype=float)
+    ys = np.asarray(values, dtype=float)
+    bucket_size = (n - 2) / (threshold - 2)
+
+    indices = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = xs[end:next_end].mean()
+        avg_y = ys[end:next_end].mean()
+
+        areas = np.abs(
+            (xs[a] - avg_x) * (ys[start:end] - ys[a])
+            - (xs[a] - xs[start:end]) * (avg_y - ys[a])
+        )
+        a = start + int(areas.argmax())
+        indices.append(a)
+
+    indices.append(n - 1)
+    return indices
+
+def build_chart_series(graph_type: str, data: Union[dict, Series], max_points: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Columnar chart data for client-side rendering, optionally downsampled to max_points.
+    `data` is a Series or the dict shape generate_graph takes for `graph_type`.
+    """
+    spec = CHART_SPECS[graph_type]
+    if isinstance(data, Series):
+        total_points = len(data)
+        if max_points:
+            data = data[lttb_indices(data.values, max_points)]
+        x_values, y_values = data.date_labels(), data.values.tolist()
+    else:
+        x_values, y_values = (list(values) for values in chart_columns(graph_type, data))
+        total_points = len(y_values)
+        if max_points:
+            keep = lttb_indices(y_values, max_points)
+            x_values = [x_values[i] for i in keep]
+            y_values = [y_values[i] for i in keep]
+
+    return {
+        "graph_type": graph_type,
+        "title": spec["title"],
+        "kind": spec["kind"],
+        "units": spec["units"],
+        "x": x_values,
+        "y": y_values,
+        "total_points": total_points,
+    }
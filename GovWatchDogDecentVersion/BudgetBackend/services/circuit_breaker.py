@@ -0,0 +1,75 @@
+import os
+import time
+from typing import Any, Dict
+
+# Consecutive failures (timeouts, connection errors, 5xx) that open a host's breaker
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+# Seconds an open breaker fails fast before letting one probe request through
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitBreaker:
+    """
+    Per-host breaker. Closed passes every call; after BREAKER_FAILURE_THRESHOLD consecutive
+    failures it opens and rejects calls at once. After BREAKER_RESET_TIMEOUT it half-opens and
+    lets a single probe through, whose outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self.short_circuited = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """ Whether a call may go out now; a True in half-open state reserves the probe """
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.short_circuited += 1
+                return False
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN:
+            if self._probing:
+                self.short_circuited += 1
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.trips += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self):
+        """ Give back a probe whose call was cancelled before it had an outcome """
+        self._probing = False
+
+    def retry_after(self) -> float:
+        """ Seconds until an open breaker lets a probe through """
+        if self.state != OPEN:
+            return 0.0
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "short_circuited": self.short_circuited,
+            "retry_after": round(self.retry_after(), 1),
+        }
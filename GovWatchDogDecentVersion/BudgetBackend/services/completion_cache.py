@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+COMPLETION_CACHE_DB_PATH = os.getenv("COMPLETION_CACHE_DB_PATH", "data/completions.db")
+COMPLETION_CACHE_TTL = int(os.getenv("COMPLETION_CACHE_TTL", str(7 * 24 * 3600)))
+COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "1000"))
+
+def data_fingerprint(data: Any) -> str:
+    """ Stable hash of the data a narrative was written from """
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+class CompletionCache:
+    """ Persistent SQLite cache of LLM completions with TTL and least-recently-used eviction """
+
+    _conn: Optional[sqlite3.Connection] = None
+    _lock = threading.Lock()
+    stats = {"hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
+
+    @classmethod
+    def connection(cls) -> sqlite3.Connection:
+        if cls._conn is None:
+            with cls._lock:
+                if cls._conn is None:
+                    directory = os.path.dirname(COMPLETION_CACHE_DB_PATH)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    conn = sqlite3.connect(COMPLETION_CACHE_DB_PATH, check_same_thread=False, isolation_level=None)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        """CREATE TABLE IF NOT EXISTS completions (
+                            key TEXT PRIMARY KEY,
+                            provider TEXT NOT NULL,
+                            model TEXT NOT NULL,
+                            content TEXT NOT NULL,
+                            created_at REAL NOT NULL,
+                            last_used_at REAL NOT NULL
+                        )"""
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used_at)")
+                    cls._conn = conn
+        return cls._conn
+
+    @classmethod
+    def close(cls):
+        with cls._lock:
+            if cls._conn is not None:
+                cls._conn.close()
+                cls._conn = None
+
+    @staticmethod
+    def key(provider: str, model: str, messages: List[Dict[str, str]], fingerprint: str) -> str:
+        return hashlib.sha256(json.dumps(
+            {"provider": provider, "model": model, "messages": messages, "data": fingerprint},
+            sort_keys=True
+        ).encode()).hexdigest()
+
+    @classmethod
+    def get(cls, key: str) -> Optional[str]:
+        now = time.time()
+        conn = cls.connection()
+        with cls._lock:
+            row = conn.execute("SELECT content, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > COMPLETION_CACHE_TTL:
+                if row is not None:
+                    conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                cls.stats["misses"] += 1
+                return None
+            conn.execute("UPDATE completions SET last_used_at = ? WHERE key = ?", (now, key))
+        cls.stats["hits"] += 1
+        return row[0]
+
+    @classmethod
+    def put(cls, key: str, provider: str, model: str, content: str):
+        now = time.time()
+        conn = cls.connection()
+        with cls._lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, provider, model, content, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, model, content, now, now)
+            )
+            # Expired entries go first, then the least recently used beyond the size bound
+            expired = conn.execute("DELETE FROM completions WHERE created_at < ?", (now - COMPLETION_CACHE_TTL,)).rowcount
+            overflow = conn.execute(
+                "DELETE FROM completions WHERE key IN ("
+                "SELECT key FROM completions ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (COMPLETION_CACHE_MAX_ENTRIES,)
+            ).rowcount
+        cls.stats["evictions"] += expired + overflow
+
+    @classmethod
+    def metrics(cls) -> Dict[str, Any]:
+        lookups = cls.stats["hits"] + cls.stats["misses"]
+        return {
+            **cls.stats,
+            "hit_ratio": cls.stats["hits"] / lookups if lookups else None,
+            "entries": cls.connection().execute("SELECT COUNT(*) FROM completions").fetchone()[0],
+        }
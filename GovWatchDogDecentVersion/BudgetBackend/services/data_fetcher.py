@@ -1,9 +1,20 @@
-import requests
-from typing import Dict, Any, Optional, List
-from fastapi import HTTPException
-from utils.errors import DataNotFoundError, DatabaseError
+import asyncio
+import json
+import logging
+import os
+import numpy as np
+from datetime import datetime
+from typing import Dict, Any, Iterator, Optional, List, Tuple
+from utils.errors import BaseAPIError, DataNotFoundError, DatabaseError, ValidationError
 from utils.validation import DataFilter
-from utils.pagination import PaginationParams, paginate, PaginatedResponse
+from utils.pagination import PaginationParams, paginate, PaginatedResponse, decode_cursor, encode_cursor
+from services.http_client import HttpClientPool
+from services.timeseries_store import TimeSeriesStore
+from services.cache_manager import CacheManager
+from utils.singleflight import SingleFlight
+from models.series import Series
+from services.derived_metrics import DERIVED_METRICS, DerivedMetrics, TRANSFORMS
+from services.datasets import DatasetCache, RecordDataset, SeriesDataset
 
 PROVINCE_API_BASES = {
     "federal": "https://open.canada.ca/data/api",
@@ -16,86 +27,197 @@ PROVINCE_API_BASES = {
 STATSCAN_API = "https://www150.statcan.gc.ca/t1/wds/rest"
 BANK_OF_CANADA_API = "https://www.bankofcanada.ca/valet"
 
-class DataFetcher:
-    @staticmethod
-    async def get_budget_data(
-        filter_params: DataFilter,
-        pagination: PaginationParams
-    ) -> PaginatedResponse[Dict[str, Any]]:
-        try:
-            # Calculate offset based on pagination parameters
-            offset = (pagination.page - 1) * pagination.page_size
-
-            # Build query based on filter parameters
-            query = {}
-            if filter_params.government_level:
-                query['government_level'] = filter_params.government_level
-            if filter_params.province:
-                query['province'] = filter_params.province
-            if filter_params.date_range:
-                query['start_date'] = filter_params.date_range.start_date
-                query['end_date'] = filter_params.date_range.end_date
-
-            # Add sorting parameters
-            if pagination.sort_by:
-                query['sort_by'] = pagination.sort_by
-                query['sort_order'] = pagination.sort_order
-
-            # Determine the API endpoint based on government level and province
-            province_key = filter_params.province.lower().replace(" ", "_") if filter_params.province else "federal"
-            if province_key not in PROVINCE_API_BASES:
-                raise DataNotFoundError(
-                    message=f"Province '{filter_params.province}' is not supported",
-                    details={"province": filter_params.province}
-                )
+# metric -> (source, series id) of the upstream series backing it
+ECONOMIC_SERIES = {
+    "gdp_growth": ("statcan", "36-10-0434-01"),
+    "employment_growth": ("statcan", "14-10-0287-01"),
+    "inflation_rate": ("boc", "CPALTT01"),
+    "bond_yields": ("boc", "V122543"),
+    # Expenditure-based GDP at current prices, the denominator of debt_to_gdp
+    "nominal_gdp": ("statcan", "36-10-0104-01"),
+}
+# Columns of a budget item that derived metrics can use as inputs
+BUDGET_COLUMNS = ("revenue", "expenses", "deficit", "net_debt")
+# Budget portals publish at most a few times a year
+BUDGET_CACHE_TTL = int(os.getenv("BUDGET_CACHE_TTL", "3600"))
+# How long past its TTL the last good budget dataset is served while its portal is failing
+BUDGET_STALE_IF_ERROR = int(os.getenv("BUDGET_STALE_IF_ERROR", str(7 * 24 * 3600)))
+# Full budget datasets are pulled in pages of this size, up to the page cap
+BUDGET_FETCH_PAGE_SIZE = int(os.getenv("BUDGET_FETCH_PAGE_SIZE", "500"))
+BUDGET_FETCH_MAX_PAGES = int(os.getenv("BUDGET_FETCH_MAX_PAGES", "20"))
 
-            base_url = PROVINCE_API_BASES[province_key]
-            url = f"{base_url}/budget"
+# StatCan and Bank of Canada series are national
+NATIONAL_GEO = "canada"
 
-            # Make the API request with pagination parameters
-            response = requests.get(
-                url,
-                params={
-                    **query,
-                    "offset": offset,
-                    "limit": pagination.page_size
-                }
-            )
+def _iso_date(value: Optional[datetime]) -> Optional[str]:
+    return value.date().isoformat() if value else None
+
+def _validate_metric(metric: str, transform: Optional[str] = None):
+    if metric not in ECONOMIC_SERIES and metric not in DERIVED_METRICS:
+        raise ValidationError(
+            message=f"Unsupported metric: {metric}",
+            details={"supported_metrics": [*ECONOMIC_SERIES, *DERIVED_METRICS]}
+        )
+    if transform is not None and transform not in TRANSFORMS:
+        raise ValidationError(
+            message=f"Unsupported transform: {transform}",
+            details={"supported_transforms": list(TRANSFORMS)}
+        )
+
+def _date_bounds(filter_params: DataFilter) -> Tuple[Optional[datetime], Optional[datetime]]:
+    date_range = filter_params.date_range
+    return (date_range.start_date, date_range.end_date) if date_range else (None, None)
+
+def _next_cursor(page: Series, scope: Dict[str, str]) -> Optional[str]:
+    """ Cursor positioned on the page's last observation, by date (the series' key) and value """
+    if not len(page):
+        return None
+    return encode_cursor({**scope, "d": str(page.dates[-1]), "v": float(page.values[-1])})
+
+def _cursor_after(cursor: str, scope: Dict[str, str]) -> Tuple[np.datetime64, float]:
+    """ The keyset position in a cursor, which must come from the same series and sort """
+    position = decode_cursor(cursor)
+    if any(position.get(name) != value for name, value in scope.items()):
+        raise ValidationError(
+            message="Cursor does not match this metric and sort order",
+            details={"cursor": cursor}
+        )
+    try:
+        return np.datetime64(position["d"], "D"), float(position["v"])
+    except (KeyError, TypeError, ValueError):
+        raise ValidationError(message="Invalid pagination cursor", details={"cursor": cursor})
 
+# Every upstream base URL, used to open the HTTP pools at startup
+UPSTREAM_BASES = [*PROVINCE_API_BASES.values(), STATSCAN_API, BANK_OF_CANADA_API]
+
+class DataFetcher:
+    # In-flight upstream calls keyed by normalized (method, url, params, payload)
+    _upstream = SingleFlight()
+
+    @staticmethod
+    async def _request_json(
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        payload: Optional[Dict[str, Any]] = None,
+        error_message: str = "Failed to fetch data from external API"
+    ) -> Any:
+        """ Call an upstream API and parse its JSON body, sharing one call between identical concurrent requests """
+        key = (
+            method,
+            url,
+            json.dumps(params, sort_keys=True, default=str) if params else None,
+            json.dumps(payload, sort_keys=True, default=str) if payload else None
+        )
+
+        async def call():
+            # Every upstream call here is a read (StatCan's getCubeData POST included), so it is safe to retry and hedge
+            response = await HttpClientPool.request(method, url, params=params, json=payload, idempotent=True)
             if response.status_code != 200:
                 raise DatabaseError(
-                    message="Failed to fetch budget data from external API",
+                    message=error_message,
                     details={"status_code": response.status_code}
                 )
+            return response.json()
+
+        return await DataFetcher._upstream.do(key, call)
+
+    @staticmethod
+    def upstream_stats() -> Dict[str, int]:
+        return DataFetcher._upstream.stats()
+
+    @staticmethod
+    async def _load_budget(url: str, query: Dict[str, Any]) -> Dict[str, Any]:
+        """ Every budget record for a query, fetched page by page at BUDGET_FETCH_PAGE_SIZE """
+        items: List[Dict[str, Any]] = []
+        total = None
+        for _ in range(BUDGET_FETCH_MAX_PAGES):
+            data = await DataFetcher._request_json(
+                "GET", url, params={**query, "offset": len(items), "limit": BUDGET_FETCH_PAGE_SIZE},
+                error_message="Failed to fetch budget data from external API"
+            )
 
-            data = response.json()
-            
             # Process and validate the response data
             if not data or "data" not in data:
+                if items:
+                    break
                 raise DataNotFoundError(
                     message="No budget data found for the specified criteria",
-                    details={"filter": filter_params.dict()}
+                    details={"query": query}
                 )
 
             # Transform the data into the expected format
-            transformed_data = []
             for item in data["data"]:
-                transformed_item = {
+                items.append({
                     "years": item.get("fiscal_years", []),
                     "revenue": item.get("revenue", []),
                     "expenses": item.get("expenses", []),
                     "deficit": item.get("deficit", []),
                     "net_debt": item.get("net_debt", [])
-                }
-                transformed_data.append(transformed_item)
+                })
+
+            # Portals that ignore offset/limit (or report no total) return everything in one response
+            total = data.get("total")
+            if total is None or len(data["data"]) < BUDGET_FETCH_PAGE_SIZE or len(items) >= total:
+                break
+
+        return {"items": items, "total": len(items)}
+
+    @staticmethod
+    async def budget_dataset(filter_params: DataFilter) -> RecordDataset:
+        """ The full normalized budget dataset for a government level and province """
+        # Determine the API endpoint based on government level and province
+        province_key = filter_params.province.lower().replace(" ", "_") if filter_params.province else "federal"
+        if province_key not in PROVINCE_API_BASES:
+            raise DataNotFoundError(
+                message=f"Province '{filter_params.province}' is not supported",
+                details={"province": filter_params.province}
+            )
+        url = f"{PROVINCE_API_BASES[province_key]}/budget"
+
+        # Pagination, sorting and date ranges are applied locally, so they are not part of the key
+        query = {}
+        if filter_params.government_level:
+            query['government_level'] = filter_params.government_level
+        if filter_params.province:
+            query['province'] = filter_params.province
+        cache_key = f"budget:{url}:{json.dumps(query, sort_keys=True)}"
+
+        loaded = await CacheManager.get_or_load(
+            cache_key,
+            lambda: DataFetcher._load_budget(url, query),
+            ttl=BUDGET_CACHE_TTL,
+            stale_if_error=BUDGET_STALE_IF_ERROR
+        )
+        # The dataset holds the loaded items, so their id cannot be reused while the entry is current
+        return DatasetCache.get(cache_key, id(loaded["items"]), lambda: RecordDataset(loaded["items"]))
+
+    @staticmethod
+    async def get_budget_data(
+        filter_params: DataFilter,
+        pagination: PaginationParams
+    ) -> PaginatedResponse[Dict[str, Any]]:
+        try:
+            dataset = await DataFetcher.budget_dataset(filter_params)
+            start, end = _date_bounds(filter_params)
+            items, total = dataset.page(
+                (pagination.page - 1) * pagination.page_size,
+                pagination.page_size,
+                pagination.sort_by,
+                pagination.sort_order,
+                start,
+                end
+            )
 
             # Return paginated response
             return paginate(
-                items=transformed_data,
-                total=data.get("total", len(transformed_data)),
+                items=items,
+                total=total,
                 params=pagination
             )
 
+        except BaseAPIError:
+            raise
         except Exception as e:
             raise DatabaseError(
                 message="Failed to fetch budget data",
@@ -103,88 +225,259 @@ class DataFetcher:
             )
 
     @staticmethod
-    async def fetch_economic_data(
-        metric: str,
-        filter_params: DataFilter,
-        pagination: PaginationParams
-    ) -> PaginatedResponse[Dict[str, Any]]:
+    async def _refresh_series(metric: str):
+        """ Pull observations newer than the last stored date into the local time-series store """
+        source, series = ECONOMIC_SERIES[metric]
+        if TimeSeriesStore.is_fresh(source, series, NATIONAL_GEO):
+            return
+
+        last_date = TimeSeriesStore.last_date(source, series, NATIONAL_GEO)
         try:
-            # Calculate offset based on pagination parameters
-            offset = (pagination.page - 1) * pagination.page_size
-
-            # Determine the appropriate API endpoint based on the metric
-            if metric in ["gdp_growth", "employment_growth"]:
-                base_url = STATSCAN_API
-                endpoint = "getCubeData"
-                product_id = "36-10-0434-01" if metric == "gdp_growth" else "14-10-0287-01"
-                
+            if source == "statcan":
                 payload = {
-                    "productId": product_id,
+                    "productId": series,
                     "dimensionAtObservation": "AllDimensions",
-                    "offset": offset,
-                    "limit": pagination.page_size
-                }
-                
-                if filter_params.date_range:
-                    payload["startDate"] = filter_params.date_range.start_date
-                    payload["endDate"] = filter_params.date_range.end_date
-
-                response = requests.post(f"{base_url}/{endpoint}", json=payload)
-
-            elif metric in ["inflation_rate", "bond_yields"]:
-                base_url = BANK_OF_CANADA_API
-                series = "CPALTT01" if metric == "inflation_rate" else "V122543"
-                
-                params = {
-                    "start_date": filter_params.date_range.start_date if filter_params.date_range else None,
-                    "end_date": filter_params.date_range.end_date if filter_params.date_range else None,
-                    "offset": offset,
-                    "limit": pagination.page_size,
-                    "format": "json"
+                    "startDate": last_date
                 }
-                
-                response = requests.get(f"{base_url}/observations/{series}", params=params)
-
+                data = await DataFetcher._request_json(
+                    "POST", f"{STATSCAN_API}/getCubeData", payload=payload,
+                    error_message=f"Failed to fetch {metric} data from external API"
+                )
             else:
-                raise ValidationError(
-                    message=f"Unsupported metric: {metric}",
-                    details={"supported_metrics": ["gdp_growth", "inflation_rate", "employment_growth", "bond_yields"]}
+                params = {"start_date": last_date, "format": "json"}
+                data = await DataFetcher._request_json(
+                    "GET", f"{BANK_OF_CANADA_API}/observations/{series}", params=params,
+                    error_message=f"Failed to fetch {metric} data from external API"
                 )
 
-            if response.status_code != 200:
-                raise DatabaseError(
-                    message=f"Failed to fetch {metric} data from external API",
-                    details={"status_code": response.status_code}
+            if source == "statcan":
+                observations = [(item["refPer"], float(item["value"])) for item in data["observations"]]
+            else:
+                observations = [(item["d"], float(item["v"])) for item in data["observations"]]
+            TimeSeriesStore.upsert(source, series, NATIONAL_GEO, observations)
+
+        except Exception as e:
+            # Serve what is already stored rather than failing on a transient upstream error
+            if last_date is None:
+                raise
+            logging.warning(f"Refresh of {metric} failed, serving stored data up to {last_date}: {e}")
+
+    @staticmethod
+    async def _stored_dataset(metric: str) -> SeriesDataset:
+        """ A stored metric's full series, rebuilt only when the store's copy changes """
+        await DataFetcher._refresh_series(metric)
+
+        source, series_id = ECONOMIC_SERIES[metric]
+        state = TimeSeriesStore.state(source, series_id, NATIONAL_GEO)
+        return DatasetCache.get(
+            ("series", metric),
+            (state["count"], state["last_date"], state["changed_at"]),
+            lambda: SeriesDataset(Series.from_rows(metric, TimeSeriesStore.query(source, series_id, NATIONAL_GEO)))
+        )
+
+    @staticmethod
+    async def fetch_economic_data(
+        metric: str,
+        filter_params: DataFilter,
+        pagination: PaginationParams,
+        transform: Optional[str] = None,
+        window: Optional[int] = None
+    ) -> PaginatedResponse:
+        """ One page of a metric's observations, with the page's items as a Series """
+        try:
+            _validate_metric(metric, transform)
+
+            start, end = _date_bounds(filter_params)
+            if metric in DERIVED_METRICS or transform:
+                # Derived and transformed series are already date-filtered and memoized by content
+                series = await DataFetcher.get_series(metric, filter_params, transform, window)
+                dataset = DatasetCache.get(
+                    ("derived", metric, transform, window, start, end),
+                    series.fingerprint(),
+                    lambda: SeriesDataset(series)
                 )
+                start = end = None
+            else:
+                dataset = await DataFetcher._stored_dataset(metric)
 
-            data = response.json()
-
-            # Transform the data based on the metric type
-            transformed_data = []
-            if metric in ["gdp_growth", "employment_growth"]:
-                transformed_data = [{
-                    "date": item["refPer"],
-                    "value": float(item["value"]),
-                    "years": [item["refPer"]],
-                    "values": [float(item["value"])]
-                } for item in data["observations"]]
+            # Sorting, date filtering and paging run over the in-memory dataset
+            cursor_scope = {
+                "s": ":".join(str(part or "") for part in (metric, transform, window)),
+                "k": "value" if pagination.sort_by == "value" else "date",
+                "o": pagination.sort_order or "asc"
+            }
+            if pagination.cursor:
+                items, has_more = dataset.seek(
+                    _cursor_after(pagination.cursor, cursor_scope),
+                    pagination.page_size,
+                    pagination.sort_by,
+                    pagination.sort_order,
+                    start,
+                    end
+                )
+                total = dataset.count(start, end) if pagination.include_total else None
             else:
-                transformed_data = [{
-                    "date": item["d"],
-                    "value": float(item["v"]),
-                    "months" if metric == "inflation_rate" else "years": [item["d"]],
-                    "values": [float(item["v"])]
-                } for item in data["observations"]]
+                offset = (pagination.page - 1) * pagination.page_size
+                items, total = dataset.page(
+                    offset,
+                    pagination.page_size,
+                    pagination.sort_by,
+                    pagination.sort_order,
+                    start,
+                    end
+                )
+                has_more = offset + len(items) < total
+                if not pagination.include_total:
+                    total = None
 
-            # Return paginated response
+            # Items stay columnar; they become the public per-observation dicts only when encoded
             return paginate(
-                items=transformed_data,
-                total=data.get("totalCount", len(transformed_data)),
-                params=pagination
+                items=items,
+                total=total,
+                params=pagination,
+                next_cursor=_next_cursor(items, cursor_scope) if has_more else None
+            )
+
+        except BaseAPIError:
+            raise
+        except Exception as e:
+            raise DatabaseError(
+                message=f"Failed to fetch {metric} data",
+                details={"error": str(e)}
+            )
+
+    @staticmethod
+    async def series_state(
+        metric: str,
+        filter_params: DataFilter,
+        transform: Optional[str] = None,
+        window: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """ Version of a metric's (date-filtered) series, for validators computed without building a response """
+        try:
+            _validate_metric(metric, transform)
+
+            # Derived series are memoized, so their fingerprint is as cheap as the stored state
+            if metric in DERIVED_METRICS or transform:
+                series = await DataFetcher.get_series(metric, filter_params, transform, window)
+                return {
+                    "count": len(series),
+                    "last_date": str(series.dates[-1]) if len(series) else None,
+                    "fingerprint": series.fingerprint()
+                }
+
+            await DataFetcher._refresh_series(metric)
+
+            source, series = ECONOMIC_SERIES[metric]
+            return TimeSeriesStore.state(
+                source, series, NATIONAL_GEO,
+                start_date=_iso_date(filter_params.date_range.start_date) if filter_params.date_range else None,
+                end_date=_iso_date(filter_params.date_range.end_date) if filter_params.date_range else None
+            )
+
+        except BaseAPIError:
+            raise
+        except Exception as e:
+            raise DatabaseError(
+                message=f"Failed to fetch {metric} data",
+                details={"error": str(e)}
+            )
+
+    @staticmethod
+    async def budget_series(column: str, filter_params: DataFilter) -> Series:
+        """ One column of the first budget item as an annual series (fiscal years dated by their first year) """
+        dataset = await DataFetcher.budget_dataset(filter_params)
+        start, end = _date_bounds(filter_params)
+        items, _ = dataset.page(0, 1, start=start, end=end)
+        if not items:
+            raise DataNotFoundError(
+                message="No budget data found for the specified criteria",
+                details={"filter": filter_params.dict()}
             )
+        item = items[0]
+        return Series.from_columns(column, [f"{str(year)[:4]}-01-01" for year in item["years"]], item[column])
+
+    @staticmethod
+    async def _input_series(name: str, filter_params: DataFilter) -> Series:
+        if name in BUDGET_COLUMNS:
+            return await DataFetcher.budget_series(name, filter_params)
+        return await DataFetcher.get_series(name, filter_params)
+
+    @staticmethod
+    async def get_series(
+        metric: str,
+        filter_params: DataFilter,
+        transform: Optional[str] = None,
+        window: Optional[int] = None
+    ) -> Series:
+        """ Full (date-filtered) series for a stored or derived metric, optionally transformed """
+        try:
+            _validate_metric(metric, transform)
+
+            if metric in DERIVED_METRICS:
+                spec = DERIVED_METRICS[metric]
+                if spec.levels and (filter_params.government_level or "Federal") not in spec.levels:
+                    raise ValidationError(
+                        message=f"{metric} is only available for: {', '.join(spec.levels)}",
+                        details={"government_level": filter_params.government_level}
+                    )
+                # Inputs come from the store and the budget cache, so deriving costs no extra upstream calls
+                inputs = await asyncio.gather(*[DataFetcher._input_series(name, filter_params) for name in spec.inputs])
+                series = DerivedMetrics.derive(metric, list(inputs))
+            else:
+                dataset = await DataFetcher._stored_dataset(metric)
+                series = dataset.select(*_date_bounds(filter_params))
+
+            if transform:
+                series = DerivedMetrics.transform(series, transform, window)
+            return series
 
+        except BaseAPIError:
+            raise
         except Exception as e:
             raise DatabaseError(
                 message=f"Failed to fetch {metric} data",
                 details={"error": str(e)}
-            )
\ No newline at end of file
+            )
+
+    @staticmethod
+    async def series_chunks(
+        metric: str,
+        filter_params: DataFilter,
+        transform: Optional[str] = None,
+        window: Optional[int] = None,
+        chunk_size: int = 1000
+    ) -> Iterator[List[Tuple[str, float]]]:
+        """
+        A metric's (date-filtered) observations as date-ordered chunks of (date, value) rows.
+        Stored metrics stream from the store; derived and transformed ones are sliced from their
+        memoized in-memory series.
+        """
+        try:
+            _validate_metric(metric, transform)
+
+            if metric in DERIVED_METRICS or transform:
+                series = await DataFetcher.get_series(metric, filter_params, transform, window)
+                return (
+                    list(zip(chunk.date_labels(), chunk.values.tolist()))
+                    for chunk in (series[i:i + chunk_size] for i in range(0, len(series), chunk_size))
+                )
+
+            await DataFetcher._refresh_series(metric)
+
+            source, series_id = ECONOMIC_SERIES[metric]
+            start, end = _date_bounds(filter_params)
+            return TimeSeriesStore.iter_query(
+                source, series_id, NATIONAL_GEO,
+                start_date=_iso_date(start),
+                end_date=_iso_date(end),
+                chunk_size=chunk_size
+            )
+
+        except BaseAPIError:
+            raise
+        except Exception as e:
+            raise DatabaseError(
+                message=f"Failed to fetch {metric} data",
+                details={"error": str(e)}
+            )
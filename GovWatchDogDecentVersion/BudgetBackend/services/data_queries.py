@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from models.inputs import DataQuery
+from services.chart_data import build_chart_series
+from services.data_fetcher import DataFetcher
+from services.derived_metrics import PERCENT_TRANSFORMS
+from utils.errors import ValidationError
+from utils.pagination import PaginationParams
+from utils.validation import DataFilter
+
+# Queries of one batch resolved at the same time; the rest wait for a slot
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+async def load_data(
+    metric: str,
+    filter_params: DataFilter,
+    pagination: PaginationParams,
+    format: str = "items",
+    max_points: Optional[int] = None,
+    transform: Optional[str] = None,
+    window: Optional[int] = None
+) -> Any:
+    """ The body of a /api/data answer: a page of items, or the whole series as chart data """
+    if metric == "budget":
+        if format != "items" or transform:
+            raise ValidationError(
+                message="Budget data is only available as paginated items",
+                details={"format": format, "transform": transform}
+            )
+        return await DataFetcher.get_budget_data(filter_params, pagination)
+
+    if format == "series":
+        series = await DataFetcher.get_series(metric, filter_params, transform, window)
+        chart = build_chart_series(metric, series, max_points)
+        if transform in PERCENT_TRANSFORMS:
+            chart["units"] = "%"
+        return chart
+
+    return await DataFetcher.fetch_economic_data(metric, filter_params, pagination, transform, window)
+
+def _query_params(query: DataQuery) -> Tuple[DataFilter, PaginationParams]:
+    try:
+        filter_params = DataFilter(
+            government_level=query.government_level,
+            province=query.province,
+            # Budget is not a DataFilter metric; its records carry every budget column
+            metric=None if query.metric == "budget" else query.metric,
+            date_range=query.date_range
+        )
+    except ValueError as e:
+        raise ValidationError(message=f"Unsupported metric: {query.metric}", details={"error": str(e)})
+    pagination = PaginationParams(
+        page=query.page,
+        page_size=query.page_size,
+        sort_by=query.sort_by,
+        sort_order=query.sort_order,
+        cursor=query.cursor,
+        include_total=query.include_total
+    )
+    return filter_params, pagination
+
+async def _resolve(query: DataQuery) -> Dict[str, Any]:
+    try:
+        filter_params, pagination = _query_params(query)
+        data = await load_data(
+            query.metric, filter_params, pagination,
+            query.format, query.max_points, query.transform, query.window
+        )
+        return {"status_code": 200, "data": data, "error": None}
+    except HTTPException as e:
+        return {"status_code": e.status_code, "data": None, "error": e.detail}
+    except Exception as e:
+        logging.exception(f"Batch query for {query.metric} failed")
+        return {"status_code": 500, "data": None, "error": {"message": "Failed to fetch data", "details": {"error": str(e)}}}
+
+async def resolve_batch(queries: List[DataQuery]) -> Dict[str, Any]:
+    """
+    Resolve every query concurrently, in request order. Identical queries are resolved once;
+    overlapping upstream work is shared through DataFetcher's single-flight calls and caches.
+    """
+    semaphore = asyncio.Semaphore(max(BATCH_CONCURRENCY, 1))
+
+    async def bounded(query: DataQuery) -> Dict[str, Any]:
+        async with semaphore:
+            return await _resolve(query)
+
+    unique: Dict[str, asyncio.Task] = {}
+    for query in queries:
+        key = query.model_dump_json()
+        if key not in unique:
+            unique[key] = asyncio.ensure_future(bounded(query))
+    await asyncio.gather(*unique.values())
+
+    return {"results": [unique[query.model_dump_json()].result() for query in queries]}
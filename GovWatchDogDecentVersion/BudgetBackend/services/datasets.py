@@ -0,0 +1,212 @@
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+from models.series import Series
+
+DATASET_CACHE_MAX_ENTRIES = int(os.getenv("DATASET_CACHE_MAX_ENTRIES", "128"))
+
+def _day(value: Optional[datetime]) -> Optional[np.datetime64]:
+    return np.datetime64(value.date(), "D") if value else None
+
+class SeriesDataset:
+    """
+    A full series materialized once, with its value sort order precomputed. Date ranges are
+    binary searches over the (sorted) dates, so any page costs O(log n + page_size).
+    """
+
+    __slots__ = ("series", "_by_value", "_sorted_values")
+
+    def __init__(self, series: Series):
+        order = np.argsort(series.dates, kind="stable")
+        self.series = series[order] if len(series) and np.any(order != np.arange(len(series))) else series
+        self._by_value: Optional[np.ndarray] = None
+        self._sorted_values: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def date_bounds(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Tuple[int, int]:
+        """ [lo, hi) positions of observations dated within the inclusive range """
+        dates = self.series.dates
+        lo = int(np.searchsorted(dates, _day(start), side="left")) if start else 0
+        hi = int(np.searchsorted(dates, _day(end), side="right")) if end else len(dates)
+        return lo, max(lo, hi)
+
+    def count(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+        lo, hi = self.date_bounds(start, end)
+        return hi - lo
+
+    def by_value(self) -> np.ndarray:
+        """ Positions in ascending value order (ties by date), computed on first use """
+        if self._by_value is None:
+            self._by_value = np.argsort(self.series.values, kind="stable")
+            self._sorted_values = self.series.values[self._by_value]
+        return self._by_value
+
+    def _value_position(self, value: float, date: np.datetime64, after: bool) -> int:
+        """ Index into the value order of the first entry after (or at) the (value, date) key """
+        order = self.by_value()
+        first = int(np.searchsorted(self._sorted_values, value, side="left"))
+        last = int(np.searchsorted(self._sorted_values, value, side="right"))
+        # Equal values keep date order, so the tie run is searched by date
+        tie_dates = self.series.dates[order[first:last]]
+        return first + int(np.searchsorted(tie_dates, date, side="right" if after else "left"))
+
+    def select(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Series:
+        lo, hi = self.date_bounds(start, end)
+        return self.series[lo:hi]
+
+    def page(
+        self,
+        offset: int,
+        limit: int,
+        sort_by: Optional[str] = None,
+        sort_order: Optional[str] = "asc",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Tuple[Series, int]:
+        """ One page of the date-filtered series, and the filtered total """
+        lo, hi = self.date_bounds(start, end)
+        total = hi - lo
+        descending = sort_order == "desc"
+        if sort_by == "value":
+            order = self.by_value()
+            if lo > 0 or hi < len(self):
+                order = order[(order >= lo) & (order < hi)]
+            if descending:
+                order = order[::-1]
+            return self.series[order[offset:offset + limit]], total
+        if descending:
+            stop = max(hi - offset, lo)
+            return self.series[max(stop - limit, lo):stop][::-1], total
+        return self.series[lo + offset:min(lo + offset + limit, hi)], total
+
+    def seek(
+        self,
+        after: Optional[Tuple[np.datetime64, float]],
+        limit: int,
+        sort_by: Optional[str] = None,
+        sort_order: Optional[str] = "asc",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Tuple[Series, bool]:
+        """
+        Up to `limit` observations following the keyset position `after` (the date and value of the
+        last observation already returned), and whether more follow. Positions are binary searches,
+        so a page costs the same however deep it is, and new observations never shift it.
+        """
+        lo, hi = self.date_bounds(start, end)
+        descending = sort_order == "desc"
+        if sort_by == "value":
+            order = self.by_value()
+            if after is None:
+                position = len(order) if descending else 0
+            else:
+                position = self._value_position(after[1], after[0], after=not descending)
+            following = order[:position][::-1] if descending else order[position:]
+            if lo > 0 or hi < len(self):
+                # Date-ranged value order has to skip out-of-range entries
+                following = following[(following >= lo) & (following < hi)]
+            return self.series[following[:limit]], len(following) > limit
+
+        dates = self.series.dates
+        if descending:
+            position = hi if after is None else min(hi, int(np.searchsorted(dates, after[0], side="left")))
+            first = max(position - limit, lo)
+            return self.series[first:position][::-1], first > lo
+        position = lo if after is None else max(lo, int(np.searchsorted(dates, after[0], side="right")))
+        last = min(position + limit, hi)
+        return self.series[position:last], last < hi
+
+def _fiscal_year(value: Any) -> Optional[int]:
+    try:
+        return int(str(value)[:4])
+    except ValueError:
+        return None
+
+def _sort_key(value: Any) -> Tuple[bool, Any]:
+    # Year-aligned columns sort by their latest year; missing values sort last
+    if isinstance(value, list):
+        value = value[-1] if value else None
+    return (value is None, 0 if value is None else value)
+
+class RecordDataset:
+    """ A source's full list of normalized records, sorted, filtered and paged locally """
+
+    __slots__ = ("items", "_orders")
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        self.items = items
+        self._orders: Dict[str, List[int]] = {}
+
+    def order(self, sort_by: str) -> List[int]:
+        """ Record positions sorted by `sort_by` (missing values last), computed once per field """
+        order = self._orders.get(sort_by)
+        if order is None:
+            keys = [_sort_key(item.get(sort_by)) for item in self.items]
+            order = self._orders[sort_by] = sorted(range(len(keys)), key=keys.__getitem__)
+        return order
+
+    @staticmethod
+    def _trim(item: Dict[str, Any], first_year: Optional[int], last_year: Optional[int]) -> Optional[Dict[str, Any]]:
+        """ The record restricted to fiscal years within the range; None if none remain """
+        years = item.get("years") or []
+        keep = [
+            i for i, year in enumerate(years)
+            if (fiscal := _fiscal_year(year)) is not None
+            and (first_year is None or fiscal >= first_year)
+            and (last_year is None or fiscal <= last_year)
+        ]
+        if not keep:
+            return None
+        if len(keep) == len(years):
+            return item
+        return {
+            key: [value[i] for i in keep] if isinstance(value, list) and len(value) == len(years) else value
+            for key, value in item.items()
+        }
+
+    def page(
+        self,
+        offset: int,
+        limit: int,
+        sort_by: Optional[str] = None,
+        sort_order: Optional[str] = "asc",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        positions = self.order(sort_by) if sort_by else range(len(self.items))
+        if sort_order == "desc":
+            positions = list(reversed(positions))
+        if start is None and end is None:
+            return [self.items[i] for i in positions[offset:offset + limit]], len(self.items)
+        first_year, last_year = (start.year if start else None), (end.year if end else None)
+        filtered = [trimmed for i in positions if (trimmed := self._trim(self.items[i], first_year, last_year)) is not None]
+        return filtered[offset:offset + limit], len(filtered)
+
+class DatasetCache:
+    """ In-process LRU of materialized datasets, one per source, rebuilt when the source's version changes """
+
+    _datasets: "OrderedDict[Hashable, Tuple[Hashable, Any]]" = OrderedDict()
+    stats = {"hits": 0, "builds": 0}
+
+    @classmethod
+    def get(cls, key: Hashable, version: Hashable, build: Callable[[], Any]) -> Any:
+        entry = cls._datasets.get(key)
+        if entry is not None and entry[0] == version:
+            cls._datasets.move_to_end(key)
+            cls.stats["hits"] += 1
+            return entry[1]
+        cls.stats["builds"] += 1
+        dataset = build()
+        cls._datasets[key] = (version, dataset)
+        cls._datasets.move_to_end(key)
+        while len(cls._datasets) > DATASET_CACHE_MAX_ENTRIES:
+            cls._datasets.popitem(last=False)
+        return dataset
+
+    @classmethod
+    def metrics(cls) -> Dict[str, Any]:
+        return {**cls.stats, "entries": len(cls._datasets)}
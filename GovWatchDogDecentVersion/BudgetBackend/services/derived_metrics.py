@@ -0,0 +1,157 @@
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from models.series import Series
+
+DERIVED_MEMO_MAX_ENTRIES = int(os.getenv("DERIVED_MEMO_MAX_ENTRIES", "256"))
+
+# Budget portals report in billions of CAD; StatCan nominal GDP is in millions of CAD
+BUDGET_UNIT_IN_MILLIONS = 1000.0
+
+# Transforms available on any metric; the percentage ones change the units to %
+TRANSFORMS = ("pct_change", "yoy", "rolling_mean", "cagr")
+PERCENT_TRANSFORMS = {"pct_change", "yoy", "cagr"}
+DEFAULT_WINDOWS = {"rolling_mean": 12, "cagr": 5}
+
+def _finite(dates: np.ndarray, values: np.ndarray, metric: str) -> Series:
+    keep = np.isfinite(values)
+    return Series(metric, dates[keep], values[keep])
+
+def _years(series: Series) -> np.ndarray:
+    return series.dates.astype("datetime64[Y]").astype(np.int64) + 1970
+
+def _year_dates(years: np.ndarray) -> np.ndarray:
+    return (years - 1970).astype("datetime64[Y]").astype("datetime64[D]")
+
+def annual(series: Series, how: str = "mean") -> Series:
+    """ One value per calendar year (mean or sum of the year's observations), dated January 1 """
+    years = _years(series)
+    unique_years, inverse = np.unique(years, return_inverse=True)
+    totals = np.bincount(inverse, weights=series.values, minlength=len(unique_years))
+    if how == "mean":
+        totals = totals / np.bincount(inverse, minlength=len(unique_years))
+    return Series(series.metric, _year_dates(unique_years), totals)
+
+def _align_years(left: Series, right: Series) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Years present in both annual series, with each side's values for them """
+    _, left_index, right_index = np.intersect1d(_years(left), _years(right), assume_unique=True, return_indices=True)
+    return left.dates[left_index], left.values[left_index], right.values[right_index]
+
+def _value_years_ago(series: Series, years: int) -> Tuple[np.ndarray, np.ndarray]:
+    """ For each point, the index of the observation exactly `years` earlier, and whether one exists """
+    # Same day of the same month, `years` earlier (month arithmetic keeps leap years aligned)
+    month_start = series.dates.astype("datetime64[M]")
+    target = (month_start - 12 * years).astype("datetime64[D]") + (series.dates - month_start.astype("datetime64[D]"))
+    index = np.searchsorted(series.dates, target)
+    found = index < len(series)
+    found[found] = series.dates[index[found]] == target[found]
+    return np.minimum(index, max(len(series) - 1, 0)), found
+
+# --- Transforms -------------------------------------------------------------
+
+def pct_change(series: Series, window: Optional[int] = None) -> Series:
+    """ Period-over-period change in percent """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = (series.values[1:] / series.values[:-1] - 1.0) * 100.0
+    return _finite(series.dates[1:], values, series.metric)
+
+def yoy(series: Series, window: Optional[int] = None) -> Series:
+    """ Change against the observation one year earlier, in percent """
+    index, found = _value_years_ago(series, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = (series.values / series.values[index] - 1.0) * 100.0
+    return _finite(series.dates[found], values[found], series.metric)
+
+def rolling_mean(series: Series, window: Optional[int] = None) -> Series:
+    """ Trailing mean over `window` observations """
+    window = window or DEFAULT_WINDOWS["rolling_mean"]
+    if len(series) < window:
+        return Series.empty(series.metric)
+    sums = np.cumsum(np.concatenate(([0.0], series.values)))
+    return Series(series.metric, series.dates[window - 1:], (sums[window:] - sums[:-window]) / window)
+
+def cagr(series: Series, window: Optional[int] = None) -> Series:
+    """ Compound annual growth rate over the trailing `window` years, in percent """
+    window = window or DEFAULT_WINDOWS["cagr"]
+    index, found = _value_years_ago(series, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = (np.power(series.values / series.values[index], 1.0 / window) - 1.0) * 100.0
+    return _finite(series.dates[found], values[found], series.metric)
+
+TRANSFORM_FUNCTIONS: Dict[str, Callable[[Series, Optional[int]], Series]] = {
+    "pct_change": pct_change,
+    "yoy": yoy,
+    "rolling_mean": rolling_mean,
+    "cagr": cagr,
+}
+
+# --- Derived metrics ----------------------------------------------------------
+
+def _debt_to_gdp(net_debt: Series, nominal_gdp: Series) -> Series:
+    """ Net debt as a percentage of the year's nominal GDP """
+    dates, debt, gdp = _align_years(annual(net_debt, "mean"), annual(nominal_gdp, "mean"))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = debt * BUDGET_UNIT_IN_MILLIONS / gdp * 100.0
+    return _finite(dates, values, "debt_to_gdp")
+
+def _interest_payments(net_debt: Series, bond_yields: Series) -> Series:
+    """ Estimated debt service: the year's average net debt at the year's average benchmark bond yield """
+    debt = annual(net_debt, "mean")
+    average_debt = debt.values.copy()
+    average_debt[1:] = (debt.values[1:] + debt.values[:-1]) / 2.0
+    dates, debt_values, yields = _align_years(Series(debt.metric, debt.dates, average_debt), annual(bond_yields, "mean"))
+    return _finite(dates, debt_values * yields / 100.0, "interest_payments")
+
+def _program_spending(expenses: Series, interest_payments: Series) -> Series:
+    """ Total expenses less (estimated) debt service """
+    dates, spent, interest = _align_years(annual(expenses, "sum"), interest_payments)
+    return _finite(dates, spent - interest, "program_spending")
+
+class DerivedMetric(NamedTuple):
+    inputs: List[str]
+    compute: Callable[..., Series]
+    # Government levels the inputs are meaningful for; None means any
+    levels: Optional[Tuple[str, ...]] = None
+
+# Inputs name budget columns (net_debt, expenses, ...), economic series or other derived metrics
+DERIVED_METRICS: Dict[str, DerivedMetric] = {
+    # Provincial GDP is not sourced, so the ratio is only defined against national GDP
+    "debt_to_gdp": DerivedMetric(["net_debt", "nominal_gdp"], _debt_to_gdp, levels=("Federal",)),
+    "interest_payments": DerivedMetric(["net_debt", "bond_yields"], _interest_payments),
+    "program_spending": DerivedMetric(["expenses", "interest_payments"], _program_spending),
+}
+
+class DerivedMetrics:
+    """ Derived series computed from already-fetched inputs, memoized by the inputs' fingerprints """
+
+    _memo: "OrderedDict[tuple, Series]" = OrderedDict()
+    stats = {"hits": 0, "misses": 0}
+
+    @classmethod
+    def _memoized(cls, key: tuple, compute: Callable[[], Series]) -> Series:
+        result = cls._memo.get(key)
+        if result is not None:
+            cls._memo.move_to_end(key)
+            cls.stats["hits"] += 1
+            return result
+        cls.stats["misses"] += 1
+        result = cls._memo[key] = compute()
+        while len(cls._memo) > DERIVED_MEMO_MAX_ENTRIES:
+            cls._memo.popitem(last=False)
+        return result
+
+    @classmethod
+    def derive(cls, metric: str, inputs: List[Series]) -> Series:
+        spec = DERIVED_METRICS[metric]
+        key = ("derive", metric, *(series.fingerprint() for series in inputs))
+        return cls._memoized(key, lambda: spec.compute(*inputs))
+
+    @classmethod
+    def transform(cls, series: Series, transform: str, window: Optional[int] = None) -> Series:
+        key = ("transform", transform, window, series.fingerprint())
+        return cls._memoized(key, lambda: TRANSFORM_FUNCTIONS[transform](series, window))
+
+    @classmethod
+    def metrics(cls):
+        return {**cls.stats, "entries": len(cls._memo)}
@@ -0,0 +1,34 @@
+import csv
+import io
+import os
+from typing import Iterable, Iterator, List, Tuple
+import orjson
+
+# Rows fetched, encoded and sent per chunk; memory use is bounded by one chunk, whatever the export size
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+}
+
+def _ndjson_chunk(metric: str, rows: List[Tuple[str, float]]) -> bytes:
+    return b"".join(orjson.dumps({"metric": metric, "date": date, "value": value}) + b"\n" for date, value in rows)
+
+def _csv_chunk(metric: str, rows: List[Tuple[str, float]]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows((metric, date, value) for date, value in rows)
+    return buffer.getvalue().encode()
+
+def encode_export(metric: str, chunks: Iterable[List[Tuple[str, float]]], format: str) -> Iterator[bytes]:
+    """
+    Encode row chunks lazily, one output chunk per input chunk. The consumer pulls the next chunk
+    only after the previous one was sent, so a slow client slows the database read instead of
+    buffering rows in memory.
+    """
+    if format == "csv":
+        yield b"metric,date,value\n"
+    encode = _csv_chunk if format == "csv" else _ndjson_chunk
+    for rows in chunks:
+        yield encode(metric, rows)
@@ -1,105 +1,169 @@
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from typing import Dict, Any, List, Sequence, Tuple, Union
+from models.series import Series
+import hashlib
+import json
 import os
+import threading
 
 # Ensure the reports directory exists
 REPORTS_DIR = "reports"
 os.makedirs(REPORTS_DIR, exist_ok=True)
 
-def generate_graph(graph_type: str, data: dict, save_dir=REPORTS_DIR):
-    """ Generate various financial graphs based on graph_type and data """
-    save_path = os.path.join(save_dir, f"{graph_type}.png")
+GRAPH_DPI = int(os.getenv("GRAPH_DPI", "100"))
+# Bump when chart styling changes so cached PNGs are not reused
+GRAPH_STYLE_VERSION = "2"
+GRAPH_CACHE_MAX_BYTES = int(os.getenv("GRAPH_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
 
-    try:
-        if graph_type == "net_debt":
-            years = data["years"]
-            net_debt = data["net_debt"]
-            plt.figure(figsize=(8, 5))
-            plt.plot(years, net_debt, marker='o', color='blue')
-            plt.title("Net Debt Over Time")
-            plt.xlabel("Year")
-            plt.ylabel("Net Debt (Billions CAD)")
-            plt.grid()
-            plt.savefig(save_path)
-            plt.close()
-
-        elif graph_type == "gdp_growth":
-            years = data["years"]
-            gdp_growth = data["gdp_growth"]
-            plt.figure(figsize=(8, 5))
-            plt.plot(years, gdp_growth, marker='o', color='green')
-            plt.title("GDP Growth Rate")
-            plt.xlabel("Year")
-            plt.ylabel("GDP Growth (%)")
-            plt.grid()
-            plt.savefig(save_path)
-            plt.close()
-
-        elif graph_type == "inflation_rate":
-            months = data["months"]
-            inflation = data["inflation_rate"]
-            plt.figure(figsize=(8, 5))
-            plt.plot(months, inflation, marker='o', color='red')
-            plt.title("Inflation Rate")
-            plt.xlabel("Month")
-            plt.ylabel("Inflation (%)")
-            plt.grid()
-            plt.savefig(save_path)
-            plt.close()
-
-        elif graph_type == "employment_growth":
-            years = data["years"]
-            employment = data["employment_growth"]
-            plt.figure(figsize=(8, 5))
-            plt.bar(years, employment, color='purple')
-            plt.title("Employment Growth Rate")
-            plt.xlabel("Year")
-            plt.ylabel("Employment Growth (%)")
-            plt.grid(axis='y')
-            plt.savefig(save_path)
-            plt.close()
-
-        elif graph_type == "interest_payments":
-            years = data["years"]
-            interest = data["interest"]
-            plt.figure(figsize=(8, 5))
-            plt.bar(years, interest, color='orange')
-            plt.title("Interest Payments Over Time")
-            plt.xlabel("Year")
-            plt.ylabel("Interest (Billions CAD)")
-            plt.grid(axis='y')
-            plt.savefig(save_path)
-            plt.close()
-
-        elif graph_type == "debt_to_gdp":
-            years = data["years"]
-            debt_to_gdp = data["debt_to_gdp"]
-            plt.figure(figsize=(8, 5))
-            plt.plot(years, debt_to_gdp, marker='o', color='cyan')
-            plt.title("Debt-to-GDP Ratio")
-            plt.xlabel("Year")
-            plt.ylabel("Debt-to-GDP (%)")
-            plt.grid()
-            plt.savefig(save_path)
-            plt.close()
-
-        elif graph_type == "program_spending":
-            sectors = data["sectors"]
-            spending = data["spending"]
-            plt.figure(figsize=(8, 5))
-            plt.bar(sectors, spending, color='lightblue')
-            plt.title("Program-Specific Spending")
-            plt.xlabel("Sector")
-            plt.ylabel("Spending (Billions CAD)")
-            plt.grid(axis='y')
-            plt.savefig(save_path)
-            plt.close()
+# Maximum number of labelled x ticks; long monthly series label every n-th point
+MAX_X_TICKS = 8
+
+# graph_type -> how to draw it: line or bar, data keys, colour, units and labels
+CHART_SPECS: Dict[str, Dict[str, Any]] = {
+    "net_debt": {"kind": "line", "x": "years", "y": "net_debt", "color": "blue", "units": "Billions CAD",
+                 "title": "Net Debt Over Time", "xlabel": "Year", "ylabel": "Net Debt (Billions CAD)"},
+    "gdp_growth": {"kind": "line", "x": "years", "y": "gdp_growth", "color": "green", "units": "%",
+                   "title": "GDP Growth Rate", "xlabel": "Year", "ylabel": "GDP Growth (%)"},
+    "inflation_rate": {"kind": "line", "x": "months", "y": "inflation_rate", "color": "red", "units": "%",
+                       "title": "Inflation Rate", "xlabel": "Month", "ylabel": "Inflation (%)"},
+    "employment_growth": {"kind": "bar", "x": "years", "y": "employment_growth", "color": "purple", "units": "%",
+                          "title": "Employment Growth Rate", "xlabel": "Year", "ylabel": "Employment Growth (%)"},
+    "interest_payments": {"kind": "bar", "x": "years", "y": "interest", "color": "orange", "units": "Billions CAD",
+                          "title": "Interest Payments Over Time", "xlabel": "Year", "ylabel": "Interest (Billions CAD)"},
+    "debt_to_gdp": {"kind": "line", "x": "years", "y": "debt_to_gdp", "color": "cyan", "units": "%",
+                    "title": "Debt-to-GDP Ratio", "xlabel": "Year", "ylabel": "Debt-to-GDP (%)"},
+    "bond_yields": {"kind": "line", "x": "years", "y": "yields", "color": "brown", "units": "%",
+                    "title": "Government Bond Yields", "xlabel": "Year", "ylabel": "Yield (%)"},
+    "program_spending": {"kind": "bar", "x": "years", "y": "spending", "color": "lightblue", "units": "Billions CAD",
+                         "title": "Program Spending", "xlabel": "Year", "ylabel": "Spending (Billions CAD)"},
+    "nominal_gdp": {"kind": "line", "x": "years", "y": "gdp", "color": "darkgreen", "units": "Millions CAD",
+                    "title": "Nominal GDP", "xlabel": "Year", "ylabel": "GDP (Millions CAD)"},
+}
+
+def chart_columns(graph_type: str, data: Union[dict, Series]) -> Tuple[List[Any], Sequence[float]]:
+    """ x and y values of chart data: a Series, or a dict keyed by the chart's x/y keys """
+    if isinstance(data, Series):
+        return data.date_labels(), data.values
+    spec = CHART_SPECS[graph_type]
+    return data[spec["x"]], data[spec["y"]]
+
+def graph_cache_key(graph_type: str, data: Union[dict, Series]) -> str:
+    """ Content hash of everything that affects the rendered image """
+    fingerprint = json.dumps(
+        {
+            "graph_type": graph_type,
+            "data": data.fingerprint() if isinstance(data, Series) else data,
+            "style": GRAPH_STYLE_VERSION,
+            "dpi": GRAPH_DPI
+        },
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:24]
+
+def graph_cache_path(graph_type: str, data: Union[dict, Series], save_dir=REPORTS_DIR) -> str:
+    return os.path.join(save_dir, "graphs", f"{graph_type}-{graph_cache_key(graph_type, data)}.png")
 
+def evict_graph_cache(cache_dir: str, max_bytes: int = GRAPH_CACHE_MAX_BYTES):
+    """ Delete least-recently-used PNGs until the cache directory fits in max_bytes """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and entry.name.endswith(".png"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+class _ChartTemplate:
+    """ A pre-built Figure/Axes for one graph_type; each render only swaps in new data """
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.lock = threading.Lock()
+        self.figure = Figure(figsize=(8, 5))
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        self.axes.set_title(spec["title"])
+        self.axes.set_xlabel(spec["xlabel"])
+        self.axes.set_ylabel(spec["ylabel"])
+        if spec["kind"] == "line":
+            self.axes.grid()
+            (self.line,) = self.axes.plot([], [], marker='o', color=spec["color"])
         else:
-            raise ValueError(f"Unsupported graph type: {graph_type}")
+            self.axes.grid(axis='y')
+            self.axes.set_axisbelow(True)
+        self.bars = None
+
+    def render(self, x_values: list, y_values: list, path: str):
+        positions = range(len(x_values))
+        if self.spec["kind"] == "line":
+            self.line.set_data(positions, y_values)
+        else:
+            if self.bars is not None:
+                self.bars.remove()
+            self.bars = self.axes.bar(positions, y_values, color=self.spec["color"])
+
+        step = max(1, -(-len(x_values) // MAX_X_TICKS))
+        self.axes.set_xticks(positions[::step], [str(x) for x in x_values[::step]])
+        self.axes.relim()
+        self.axes.autoscale_view()
+        self.figure.savefig(path, format="png", dpi=GRAPH_DPI)
+
+# Templates are built lazily, once per process
+_templates: Dict[str, _ChartTemplate] = {}
+
+def _template(graph_type: str) -> _ChartTemplate:
+    template = _templates.get(graph_type)
+    if template is None:
+        template = _templates[graph_type] = _ChartTemplate(CHART_SPECS[graph_type])
+    return template
+
+def warm_templates():
+    for graph_type in CHART_SPECS:
+        _template(graph_type)
+
+def render_chart(graph_type: str, x_values: list, y_values: list, path: str):
+    """ Draw one chart straight to a PNG file, bypassing the content-addressed cache """
+    template = _template(graph_type)
+    with template.lock:
+        template.render(list(x_values), list(y_values), path)
+
+def generate_graph(graph_type: str, data: Union[dict, Series], save_dir=REPORTS_DIR):
+    """ Generate various financial graphs based on graph_type and data """
+    if graph_type not in CHART_SPECS:
+        raise ValueError(f"Unsupported graph type: {graph_type}")
+
+    save_path = graph_cache_path(graph_type, data, save_dir)
+    cache_dir = os.path.dirname(save_path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Identical chart data renders to an identical image; reuse it and mark it recently used
+    if os.path.exists(save_path):
+        os.utime(save_path)
+        return save_path
+
+    # Render to a private file and rename, so concurrent renders never expose a partial PNG
+    tmp_path = f"{save_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    try:
+        render_chart(graph_type, *chart_columns(graph_type, data), tmp_path)
 
+        os.replace(tmp_path, save_path)
+        evict_graph_cache(cache_dir)
         print(f"Generated graph: {save_path}")
         return save_path
 
     except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         print(f"Error generating graph {graph_type}: {e}")
         raise Exception(f"Graph generation failed for {graph_type}")
@@ -0,0 +1,303 @@
+import asyncio
+import httpx
+import json
+import logging
+import os
+import random
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Any, Iterable, NamedTuple, Optional
+from urllib.parse import urlsplit
+from services.circuit_breaker import CircuitBreaker
+from services.rate_limiter import RateLimiter
+from utils.errors import UpstreamRateLimitedError, UpstreamUnavailableError
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_MAX_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+# Overall budget for one attempt at an upstream call, including connect, every read and any hedge
+HTTP_REQUEST_DEADLINE = float(os.getenv("HTTP_REQUEST_DEADLINE", "30"))
+# Send a second, identical idempotent call if the first has not answered after this many seconds; 0 disables hedging
+HTTP_HEDGE_DELAY = float(os.getenv("HTTP_HEDGE_DELAY", "0"))
+# Retries after the first attempt, and the exponential backoff between them (base * 2^attempt, capped)
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "10"))
+RETRYABLE_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+class UpstreamPolicy(NamedTuple):
+    connect: float = HTTP_CONNECT_TIMEOUT
+    read: float = HTTP_READ_TIMEOUT
+    deadline: float = HTTP_REQUEST_DEADLINE
+    hedge_delay: float = HTTP_HEDGE_DELAY
+
+# Per-host overrides of the defaults above; HTTP_HOST_POLICIES (JSON, same shape) overrides these
+UPSTREAM_POLICIES: Dict[str, Dict[str, float]] = {
+    # getCubeData assembles whole tables server-side and is routinely slow
+    "www150.statcan.gc.ca": {"read": 60, "deadline": 90},
+    **json.loads(os.getenv("HTTP_HOST_POLICIES", "{}")),
+}
+
+def policy_for(url: str) -> UpstreamPolicy:
+    return UpstreamPolicy(**UPSTREAM_POLICIES.get(urlsplit(url).hostname or "", {}))
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """ Seconds from a Retry-After header (delta-seconds or HTTP-date), if present """
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def _backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """ Retry-After plus a little jitter, else exponential backoff with full jitter """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, HTTP_BACKOFF_BASE)
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def _clean(value: Any) -> Any:
+    """ Drop None entries and render dates the way the upstream APIs expect """
+    if isinstance(value, dict):
+        return {k: _clean(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (datetime, date)):
+        return value.date().isoformat() if isinstance(value, datetime) else value.isoformat()
+    return value
+
+class HttpClientPool:
+    """
+    One keep-alive httpx.AsyncClient per upstream host, shared by every request, behind a
+    per-host circuit breaker, per-host timeouts and optional hedging of GETs.
+    """
+
+    _clients: Dict[str, httpx.AsyncClient] = {}
+    _breakers: Dict[str, CircuitBreaker] = {}
+    _stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"requests": 0, "failures": 0, "timeouts": 0, "retries": 0, "hedged": 0, "hedge_wins": 0})
+
+    @classmethod
+    def _create_client(cls) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                connect=HTTP_CONNECT_TIMEOUT,
+                read=HTTP_READ_TIMEOUT,
+                write=HTTP_READ_TIMEOUT,
+                pool=HTTP_POOL_TIMEOUT
+            ),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_PER_HOST,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+
+    @classmethod
+    async def startup(cls, base_urls: Iterable[str]):
+        for base_url in base_urls:
+            origin = _origin(base_url)
+            if origin not in cls._clients:
+                cls._clients[origin] = cls._create_client()
+        logging.info(f"Opened HTTP pools for {len(cls._clients)} upstream hosts")
+
+    @classmethod
+    async def shutdown(cls):
+        clients, cls._clients = cls._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    @classmethod
+    def client_for(cls, url: str) -> httpx.AsyncClient:
+        """ Pool for the host of `url`, created lazily for hosts not registered at startup """
+        origin = _origin(url)
+        client = cls._clients.get(origin)
+        if client is None or client.is_closed:
+            client = cls._clients[origin] = cls._create_client()
+        return client
+
+    @classmethod
+    def breaker_for(cls, url: str) -> CircuitBreaker:
+        origin = _origin(url)
+        breaker = cls._breakers.get(origin)
+        if breaker is None:
+            breaker = cls._breakers[origin] = CircuitBreaker()
+        return breaker
+
+    @classmethod
+    async def _hedged(cls, origin: str, send: Callable[[], Awaitable[httpx.Response]], delay: float) -> httpx.Response:
+        """ First successful response of the original call and, if it is slow, one identical backup """
+        primary = asyncio.ensure_future(send())
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            cls._stats[origin]["hedged"] += 1
+            backup = asyncio.ensure_future(send())
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            cls._stats[origin]["hedge_wins"] += 1
+                        return task.result()
+            # Both failed; report the original call's error
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @classmethod
+    async def _attempt(
+        cls,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        json: Optional[Dict[str, Any]],
+        idempotent: bool
+    ) -> httpx.Response:
+        """
+        One call within the host's deadline. Fails fast with UpstreamUnavailableError while the host's
+        breaker is open; timeouts, connection errors and 5xx responses count against it.
+        """
+        origin = _origin(url)
+        policy = policy_for(url)
+        breaker = cls.breaker_for(url)
+        if not breaker.allow():
+            raise UpstreamUnavailableError(
+                message=f"{origin} is unavailable, not retrying until its circuit breaker resets",
+                details={"host": origin, "retry_after": round(breaker.retry_after(), 1)},
+                retry_after=breaker.retry_after()
+            )
+
+        stats = cls._stats[origin]
+        stats["requests"] += 1
+        timeout = httpx.Timeout(connect=policy.connect, read=policy.read, write=policy.read, pool=HTTP_POOL_TIMEOUT)
+
+        def send() -> Awaitable[httpx.Response]:
+            return cls.client_for(url).request(
+                method,
+                url,
+                params=_clean(params) if params else None,
+                json=_clean(json) if json else None,
+                timeout=timeout
+            )
+
+        try:
+            # Only idempotent calls are hedged: a duplicate write is not guaranteed to be harmless
+            if idempotent and policy.hedge_delay > 0:
+                response = await asyncio.wait_for(cls._hedged(origin, send, policy.hedge_delay), policy.deadline)
+            else:
+                response = await asyncio.wait_for(send(), policy.deadline)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            stats["timeouts"] += 1
+            breaker.record_failure()
+            raise
+        except httpx.TransportError:
+            stats["failures"] += 1
+            breaker.record_failure()
+            raise
+        except Exception:
+            # Anything else (a bad payload, a decoding error) still settles the probe
+            stats["failures"] += 1
+            breaker.record_failure()
+            raise
+
+        # A 429 is a healthy host asking us to slow down; the rate limiter handles it
+        if response.status_code >= 500:
+            stats["failures"] += 1
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    @classmethod
+    async def _backoff(cls, origin: str, attempt: int, retry_after: Optional[float] = None):
+        cls._stats[origin]["retries"] += 1
+        await asyncio.sleep(_backoff_delay(attempt, retry_after))
+
+    @classmethod
+    async def request(
+        cls,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        idempotent: Optional[bool] = None
+    ) -> httpx.Response:
+        """
+        Call an upstream, paced by its host's token bucket. A 429 slows the host's bucket down for
+        its Retry-After (or an exponential backoff) and is retried; idempotent calls also retry
+        502/503/504, timeouts and connection errors with jittered exponential backoff. After
+        HTTP_MAX_RETRIES, a 429 raises UpstreamRateLimitedError and a timeout UpstreamUnavailableError.
+        """
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        origin = _origin(url)
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            last = attempt == HTTP_MAX_RETRIES
+            await RateLimiter.acquire(url)
+            try:
+                response = await cls._attempt(method, url, params, json, idempotent)
+            except (asyncio.TimeoutError, httpx.TimeoutException) as e:
+                if last or not idempotent:
+                    raise UpstreamUnavailableError(
+                        message=f"{origin} did not answer in time",
+                        details={"host": origin, "deadline": policy_for(url).deadline, "error": type(e).__name__}
+                    ) from e
+                await cls._backoff(origin, attempt)
+                continue
+            except httpx.TransportError:
+                if last or not idempotent:
+                    raise
+                await cls._backoff(origin, attempt)
+                continue
+
+            if response.status_code == 429:
+                # The next acquire waits out the pause, so every caller for this host backs off together
+                retry_after = _retry_after(response)
+                pause = _backoff_delay(attempt, retry_after)
+                await RateLimiter.throttled(url, pause)
+                if last:
+                    raise UpstreamRateLimitedError(
+                        message=f"{origin} is rate limiting requests, try again later",
+                        details={"host": origin, "retry_after": round(pause, 1)},
+                        retry_after=pause
+                    )
+                cls._stats[origin]["retries"] += 1
+                continue
+
+            if response.status_code in RETRYABLE_STATUSES and idempotent and not last:
+                retry_after = _retry_after(response)
+                if retry_after is None or retry_after <= HTTP_BACKOFF_MAX:
+                    await cls._backoff(origin, attempt, retry_after)
+                    continue
+
+            if response.status_code < 500:
+                await RateLimiter.succeeded(url)
+            return response
+
+    @classmethod
+    def metrics(cls) -> Dict[str, Any]:
+        """ Breaker state, trip counts and traffic per upstream host """
+        return {
+            origin: {**cls._stats[origin], **breaker.snapshot()}
+            for origin, breaker in cls._breakers.items()
+        }
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from models.inputs import ReportRequest
+from services.report_pipeline import build_report
+from utils.errors import BaseAPIError
+from utils.pagination import PaginationParams
+from utils.validation import DataFilter
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "data/jobs.db")
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+# Finished jobs are kept this long for polling, then purged
+REPORT_JOB_RETENTION = int(os.getenv("REPORT_JOB_RETENTION", "86400"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class ReportJobQueue:
+    """ Report jobs persisted in SQLite and run by a bounded pool of asyncio workers """
+
+    _conn: Optional[sqlite3.Connection] = None
+    _lock = threading.Lock()
+    _queue: Optional[asyncio.Queue] = None
+    _workers: List[asyncio.Task] = []
+    _finished: Dict[str, asyncio.Event] = {}
+
+    @classmethod
+    def connection(cls) -> sqlite3.Connection:
+        if cls._conn is None:
+            with cls._lock:
+                if cls._conn is None:
+                    directory = os.path.dirname(JOBS_DB_PATH)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    conn = sqlite3.connect(JOBS_DB_PATH, check_same_thread=False, isolation_level=None)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.row_factory = sqlite3.Row
+                    conn.execute(
+                        """CREATE TABLE IF NOT EXISTS jobs (
+                            id TEXT PRIMARY KEY,
+                            dedupe_key TEXT NOT NULL,
+                            status TEXT NOT NULL,
+                            params TEXT NOT NULL,
+                            result TEXT,
+                            error TEXT,
+                            created_at REAL NOT NULL,
+                            started_at REAL,
+                            finished_at REAL
+                        )"""
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status)")
+                    cls._conn = conn
+        return cls._conn
+
+    @classmethod
+    async def startup(cls):
+        cls._queue = asyncio.Queue()
+        conn = cls.connection()
+        conn.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - REPORT_JOB_RETENTION,))
+        # Jobs interrupted by the last shutdown are picked up again
+        for row in conn.execute("SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", ACTIVE_STATUSES).fetchall():
+            conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE id = ?", (row["id"],))
+            cls._queue.put_nowait(row["id"])
+        cls._workers = [asyncio.create_task(cls._worker()) for _ in range(max(REPORT_JOB_WORKERS, 1))]
+
+    @classmethod
+    async def shutdown(cls):
+        for worker in cls._workers:
+            worker.cancel()
+        await asyncio.gather(*cls._workers, return_exceptions=True)
+        cls._workers = []
+        with cls._lock:
+            if cls._conn is not None:
+                cls._conn.close()
+                cls._conn = None
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": json.loads(row["error"]) if row["error"] else None,
+        }
+
+    @classmethod
+    def submit(
+        cls,
+        request: ReportRequest,
+        filter_params: DataFilter,
+        pagination: PaginationParams,
+        output: str = "images",
+        max_points: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """ Queue a report, or return the queued/running job for identical inputs """
+        params = json.dumps({
+            "request": request.model_dump(),
+            "filter_params": filter_params.model_dump(),
+            "pagination": pagination.model_dump(),
+            "output": output,
+            "max_points": max_points,
+        }, sort_keys=True, default=str)
+        dedupe_key = hashlib.sha256(params.encode()).hexdigest()
+
+        conn = cls.connection()
+        with cls._lock:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE dedupe_key = ? AND status IN (?, ?)",
+                (dedupe_key, *ACTIVE_STATUSES)
+            ).fetchone()
+            if row is not None:
+                return cls._to_dict(row)
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, dedupe_key, status, params, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, dedupe_key, params, time.time())
+            )
+        cls._queue.put_nowait(job_id)
+        return cls.get(job_id)
+
+    @classmethod
+    def get(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        row = cls.connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return cls._to_dict(row) if row else None
+
+    @classmethod
+    async def wait(cls, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """ Long-poll: return once the job finishes or `timeout` seconds pass, whichever is first """
+        job = cls.get(job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES or timeout <= 0:
+            return job
+        event = cls._finished.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return cls.get(job_id)
+
+    @classmethod
+    def _finish(cls, job_id: str, status: str, result: Any = None, error: Any = None):
+        conn = cls.connection()
+        conn.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - REPORT_JOB_RETENTION,))
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (
+                status,
+                json.dumps(result) if result is not None else None,
+                json.dumps(error) if error is not None else None,
+                time.time(),
+                job_id
+            )
+        )
+        event = cls._finished.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    @classmethod
+    async def _run(cls, job_id: str):
+        row = cls.connection().execute("SELECT params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return
+        params = json.loads(row["params"])
+        cls.connection().execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job_id))
+        try:
+            report = await build_report(
+                ReportRequest(**params["request"]),
+                DataFilter(**params["filter_params"]),
+                PaginationParams(**params["pagination"]),
+                params["output"],
+                params["max_points"]
+            )
+            cls._finish(job_id, "succeeded", result=report.model_dump())
+        except BaseAPIError as e:
+            cls._finish(job_id, "failed", error=e.detail)
+        except Exception as e:
+            logging.error(f"Report job {job_id} failed: {e}")
+            cls._finish(job_id, "failed", error={"message": "Failed to generate report", "details": {"error": str(e)}})
+
+    @classmethod
+    async def _worker(cls):
+        while True:
+            job_id = await cls._queue.get()
+            try:
+                await cls._run(job_id)
+            finally:
+                cls._queue.task_done()
+
+    @classmethod
+    def metrics(cls) -> Dict[str, Any]:
+        counts = dict(cls.connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"workers": len(cls._workers), "queue_depth": cls._queue.qsize() if cls._queue else 0, **counts}
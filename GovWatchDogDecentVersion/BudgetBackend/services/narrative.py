@@ -0,0 +1,78 @@
+import os
+from typing import AsyncIterator, Dict, List, Optional
+from groq import AsyncGroq
+from openai import AsyncOpenAI
+from models.inputs import ReportRequest
+from services.completion_cache import CompletionCache
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+OPENAI_MODEL = "gpt-4"
+GROQ_MODEL = "llama-3.3-70b-versatile"
+
+SYSTEM_PROMPT = "You are a financial analyst generating an in-depth financial report."
+
+_clients = {}
+
+def get_ai_provider() -> str:
+    if OPENAI_API_KEY:
+        return "openai"
+    elif GROQ_API_KEY:
+        return "groq"
+    else:
+        raise ValueError("No AI API key found. Set OPENAI_API_KEY or GROQ_API_KEY in the environment.")
+
+def _client(provider: str):
+    """ One async client per provider, reusing its connection pool across reports """
+    if provider not in _clients:
+        _clients[provider] = AsyncOpenAI(api_key=OPENAI_API_KEY) if provider == "openai" else AsyncGroq(api_key=GROQ_API_KEY)
+    return _clients[provider]
+
+def _model(provider: str) -> str:
+    return OPENAI_MODEL if provider == "openai" else GROQ_MODEL
+
+def build_messages(request: ReportRequest) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Generate a financial report analyzing budget data, GDP growth, inflation rates, employment trends, debt-to-GDP ratios, and bond yields for {request.government_level} - {request.province or 'Canada'}."}
+    ]
+
+def _lookup(request: ReportRequest, key: str) -> Optional[str]:
+    """ Cached narrative for `key`, unless the caller asked to refresh it """
+    if request.refresh_narrative:
+        CompletionCache.stats["bypassed"] += 1
+        return None
+    return CompletionCache.get(key)
+
+async def generate_narrative(request: ReportRequest, fingerprint: str = "") -> str:
+    """ Complete AI report narrative in one response, served from the completion cache when possible """
+    provider = get_ai_provider()
+    model, messages = _model(provider), build_messages(request)
+    key = CompletionCache.key(provider, model, messages, fingerprint)
+    cached = _lookup(request, key)
+    if cached is not None:
+        return cached
+
+    response = await _client(provider).chat.completions.create(model=model, messages=messages)
+    content = response.choices[0].message.content
+    CompletionCache.put(key, provider, model, content)
+    return content
+
+async def stream_narrative(request: ReportRequest, fingerprint: str = "") -> AsyncIterator[str]:
+    """ AI report narrative as text chunks, yielded as the model produces them (or at once from cache) """
+    provider = get_ai_provider()
+    model, messages = _model(provider), build_messages(request)
+    key = CompletionCache.key(provider, model, messages, fingerprint)
+    cached = _lookup(request, key)
+    if cached is not None:
+        yield cached
+        return
+
+    stream = await _client(provider).chat.completions.create(model=model, messages=messages, stream=True)
+    parts = []
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+    # Only a completed stream is cached
+    CompletionCache.put(key, provider, model, "".join(parts))
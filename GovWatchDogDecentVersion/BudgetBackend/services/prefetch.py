@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from services.data_fetcher import DataFetcher, PROVINCE_API_BASES, ECONOMIC_SERIES
+from services.report_pipeline import fetch_report_sources, build_graph_jobs, render_graphs
+from utils.pagination import PaginationParams
+from utils.validation import DataFilter
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "3600"))
+# Each wait is randomized by +/- this fraction so workers and restarts do not align
+PREFETCH_JITTER = float(os.getenv("PREFETCH_JITTER", "0.1"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "4"))
+PREFETCH_RENDER_CHARTS = os.getenv("PREFETCH_RENDER_CHARTS", "false").lower() == "true"
+# Share of province x metric combinations that must be warm for /ready to pass
+PREFETCH_READY_RATIO = float(os.getenv("PREFETCH_READY_RATIO", "0.8"))
+
+PREFETCH_METRICS = ["budget", *ECONOMIC_SERIES]
+
+def _jittered(seconds: float) -> float:
+    return seconds * random.uniform(1 - PREFETCH_JITTER, 1 + PREFETCH_JITTER)
+
+def _filter_for(province_key: str) -> DataFilter:
+    if province_key == "federal":
+        return DataFilter(government_level="Federal")
+    return DataFilter(government_level="Province", province=province_key.replace("_", " ").title())
+
+def _default_pagination() -> PaginationParams:
+    return PaginationParams(page=1, page_size=10, sort_by=None, sort_order="asc")
+
+class Prefetcher:
+    """ Background warm-up of every province x metric combination on a jittered schedule """
+
+    _task: Optional[asyncio.Task] = None
+    # (province, metric) -> outcome of the last attempt
+    coverage: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    last_run: Dict[str, Any] = {}
+
+    @classmethod
+    def startup(cls):
+        if PREFETCH_ENABLED and cls._task is None:
+            cls._task = asyncio.create_task(cls._loop())
+
+    @classmethod
+    async def shutdown(cls):
+        if cls._task is not None:
+            cls._task.cancel()
+            await asyncio.gather(cls._task, return_exceptions=True)
+            cls._task = None
+
+    @classmethod
+    async def _loop(cls):
+        # A short random delay keeps freshly started workers from prefetching in lockstep
+        await asyncio.sleep(random.uniform(0, 5))
+        while True:
+            try:
+                await cls.run_once()
+            except Exception as e:
+                logging.error(f"Prefetch run failed: {e}")
+            await asyncio.sleep(_jittered(PREFETCH_INTERVAL))
+
+    @classmethod
+    async def _warm(cls, semaphore: asyncio.Semaphore, province_key: str, metric: str):
+        async with semaphore:
+            started = time.time()
+            try:
+                if metric == "budget":
+                    await DataFetcher.get_budget_data(_filter_for(province_key), _default_pagination())
+                else:
+                    await DataFetcher.fetch_economic_data(metric, _filter_for(province_key), _default_pagination())
+                cls.coverage[(province_key, metric)] = {"ok": True, "warmed_at": time.time(), "seconds": time.time() - started}
+            except Exception as e:
+                previous = cls.coverage.get((province_key, metric), {})
+                cls.coverage[(province_key, metric)] = {
+                    "ok": False,
+                    "warmed_at": previous.get("warmed_at"),
+                    "error": str(e),
+                }
+
+    @classmethod
+    async def _render(cls, semaphore: asyncio.Semaphore, province_key: str):
+        async with semaphore:
+            try:
+                sources = await fetch_report_sources(_filter_for(province_key), _default_pagination())
+                await render_graphs(build_graph_jobs(sources))
+            except Exception as e:
+                logging.warning(f"Chart prefetch for {province_key} failed: {e}")
+
+    @classmethod
+    async def run_once(cls):
+        """ Warm every combination once, at most PREFETCH_CONCURRENCY at a time """
+        semaphore = asyncio.Semaphore(max(PREFETCH_CONCURRENCY, 1))
+        started = time.time()
+        jobs: List = [
+            cls._warm(semaphore, province_key, metric)
+            for province_key in PROVINCE_API_BASES
+            for metric in PREFETCH_METRICS
+        ]
+        if PREFETCH_RENDER_CHARTS:
+            jobs += [cls._render(semaphore, province_key) for province_key in PROVINCE_API_BASES]
+        await asyncio.gather(*jobs)
+        cls.last_run = {"started_at": started, "seconds": time.time() - started}
+
+    @classmethod
+    def readiness(cls) -> Dict[str, Any]:
+        """ Share of combinations warmed successfully within the last two intervals """
+        total = len(PROVINCE_API_BASES) * len(PREFETCH_METRICS)
+        fresh_after = time.time() - 2 * PREFETCH_INTERVAL
+        warm = [
+            key for key, outcome in cls.coverage.items()
+            if outcome.get("warmed_at") and outcome["warmed_at"] >= fresh_after
+        ]
+        failing = {f"{province}:{metric}": outcome["error"] for (province, metric), outcome in cls.coverage.items() if not outcome["ok"]}
+        coverage = len(warm) / total if total else 1.0
+        return {
+            "ready": not PREFETCH_ENABLED or coverage >= PREFETCH_READY_RATIO,
+            "prefetch_enabled": PREFETCH_ENABLED,
+            "coverage": coverage,
+            "warm": len(warm),
+            "total": total,
+            "failing": failing,
+            "last_run": cls.last_run,
+        }
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+from services.cache_manager import CACHE_PREFIX, CacheManager
+from utils.errors import UpstreamRateLimitedError
+
+# memory: one bucket per host per worker; redis: one bucket per host shared by every worker
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DEFAULT_RATE = float(os.getenv("RATE_LIMIT_DEFAULT_RATE", "10"))
+RATE_LIMIT_DEFAULT_BURST = float(os.getenv("RATE_LIMIT_DEFAULT_BURST", "10"))
+# A caller waits at most this long for a token; beyond it the call fails with a 429 instead of queueing
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "10"))
+# A 429 halves the host's rate (down to this fraction of its limit); each success adds back this fraction
+RATE_LIMIT_MIN_FRACTION = float(os.getenv("RATE_LIMIT_MIN_FRACTION", "0.1"))
+RATE_LIMIT_RECOVERY_STEP = float(os.getenv("RATE_LIMIT_RECOVERY_STEP", "0.05"))
+
+# Requests per second and burst per host; RATE_LIMITS (JSON, same shape) overrides these
+UPSTREAM_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    # WDS allows 25 requests per second per server; stay well under it
+    "www150.statcan.gc.ca": {"rate": 10, "burst": 10},
+    "www.bankofcanada.ca": {"rate": 10, "burst": 10},
+    **json.loads(os.getenv("RATE_LIMITS", "{}")),
+}
+
+# One atomic step on a shared bucket: refill, then acquire a token, register a 429 or register a success.
+# Returns the seconds to wait for the token and the host's current (adaptive) rate. An acquire that
+# would wait longer than max_wait takes no token, so rejected calls never leave debt behind.
+_BUCKET_SCRIPT = """
+local max_rate, burst = tonumber(ARGV[2]), tonumber(ARGV[3])
+local min_rate, step, retry_after = tonumber(ARGV[4]), tonumber(ARGV[5]), tonumber(ARGV[6])
+local max_wait = tonumber(ARGV[7])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'rate', 'blocked_until')
+local rate = tonumber(state[3]) or max_rate
+local tokens = math.min(burst, (tonumber(state[1]) or burst) + (now - (tonumber(state[2]) or now)) * rate)
+local blocked_until = tonumber(state[4]) or 0
+local wait = 0
+if ARGV[1] == 'acquire' then
+    wait = math.max((1 - tokens) / rate, blocked_until - now, 0)
+    if wait <= max_wait then
+        tokens = tokens - 1
+    end
+elseif ARGV[1] == 'throttle' then
+    rate = math.max(rate / 2, min_rate)
+    blocked_until = math.max(blocked_until, now + retry_after)
+else
+    rate = math.min(max_rate, rate + step)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now, 'rate', rate, 'blocked_until', blocked_until)
+redis.call('EXPIRE', KEYS[1], 3600)
+return {tostring(wait), tostring(rate)}
+"""
+
+def _host(url: str) -> str:
+    return urlsplit(url).hostname or ""
+
+class TokenBucket:
+    """
+    In-process token bucket with an adaptive rate (halved on 429, stepped back up on success).
+    Tokens are reserved up front, so concurrent callers queue in arrival order without a lock.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, max_wait: float = RATE_LIMIT_MAX_WAIT) -> float:
+        """ Take a token and return how long to wait before using it; no token is taken if that exceeds max_wait """
+        now = time.monotonic()
+        self._refill(now)
+        wait = max((1 - self.tokens) / self.rate, self.blocked_until - now, 0.0)
+        if wait <= max_wait:
+            self.tokens -= 1
+        return wait
+
+    def throttle(self, retry_after: float):
+        self._refill(time.monotonic())
+        self.rate = max(self.rate / 2, self.max_rate * RATE_LIMIT_MIN_FRACTION)
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def recover(self):
+        self._refill(time.monotonic())
+        self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_LIMIT_RECOVERY_STEP)
+
+class RateLimiter:
+    """ Per-host token buckets for upstream calls, in-process or shared through Redis """
+
+    _buckets: Dict[str, TokenBucket] = {}
+    _stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {"acquired": 0, "waited_seconds": 0.0, "throttled": 0, "rejected": 0})
+    redis_errors = 0
+
+    @classmethod
+    def bucket_for(cls, host: str) -> TokenBucket:
+        bucket = cls._buckets.get(host)
+        if bucket is None:
+            limits = UPSTREAM_RATE_LIMITS.get(host, {})
+            bucket = cls._buckets[host] = TokenBucket(
+                limits.get("rate", RATE_LIMIT_DEFAULT_RATE),
+                limits.get("burst", RATE_LIMIT_DEFAULT_BURST)
+            )
+        return bucket
+
+    @classmethod
+    async def _shared(cls, host: str, mode: str, retry_after: float = 0.0) -> Optional[Tuple[float, float]]:
+        """ Run one bucket step in Redis; None when Redis is not in use or not reachable """
+        if RATE_LIMIT_BACKEND != "redis" or CacheManager.redis_client is None:
+            return None
+        bucket = cls.bucket_for(host)
+        try:
+            wait, rate = await CacheManager.redis_client.eval(
+                _BUCKET_SCRIPT, 1, f"{CACHE_PREFIX}:ratelimit:{host}",
+                mode, bucket.max_rate, bucket.burst, bucket.max_rate * RATE_LIMIT_MIN_FRACTION,
+                bucket.max_rate * RATE_LIMIT_RECOVERY_STEP, retry_after, RATE_LIMIT_MAX_WAIT
+            )
+        except Exception as e:
+            # Fall back to this worker's own bucket rather than failing the call
+            cls.redis_errors += 1
+            logging.warning(f"Shared rate limit for {host} unavailable, using the local bucket: {e}")
+            return None
+        # Mirror the shared rate so successes at full rate skip the round-trip
+        bucket.rate = float(rate)
+        return float(wait), float(rate)
+
+    @classmethod
+    async def acquire(cls, url: str) -> float:
+        """
+        Wait for the host's next token and return the seconds waited. Raises UpstreamRateLimitedError
+        instead of waiting longer than RATE_LIMIT_MAX_WAIT.
+        """
+        host = _host(url)
+        stats = cls._stats[host]
+        shared = await cls._shared(host, "acquire")
+        bucket = cls.bucket_for(host)
+        wait = shared[0] if shared else bucket.reserve()
+        if wait > RATE_LIMIT_MAX_WAIT:
+            # Neither bucket debited a token for this call
+            stats["rejected"] += 1
+            raise UpstreamRateLimitedError(
+                message=f"{host} is rate limiting requests, try again later",
+                details={"host": host, "retry_after": round(wait, 1)},
+                retry_after=wait
+            )
+        if wait > 0:
+            stats["waited_seconds"] += wait
+            await asyncio.sleep(wait)
+        stats["acquired"] += 1
+        return wait
+
+    @classmethod
+    async def throttled(cls, url: str, retry_after: float):
+        """ The host answered 429: slow down and hold every caller back for `retry_after` """
+        host = _host(url)
+        cls._stats[host]["throttled"] += 1
+        if await cls._shared(host, "throttle", retry_after) is None:
+            cls.bucket_for(host).throttle(retry_after)
+
+    @classmethod
+    async def succeeded(cls, url: str):
+        host = _host(url)
+        bucket = cls.bucket_for(host)
+        if bucket.rate >= bucket.max_rate:
+            return
+        if await cls._shared(host, "recover") is None:
+            bucket.recover()
+
+    @classmethod
+    def metrics(cls) -> Dict[str, Any]:
+        hosts = {
+            host: {**cls._stats[host], "rate": round(bucket.rate, 2), "max_rate": bucket.max_rate}
+            for host, bucket in cls._buckets.items()
+        }
+        return {"backend": RATE_LIMIT_BACKEND, "redis_errors": cls.redis_errors, "hosts": hosts}
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Union
+from models.series import Series
+from services.graph_generator import generate_graph, graph_cache_path, warm_templates
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(min(os.cpu_count() or 1, 4))))
+
+def _warm_worker():
+    """ Build every chart template once per worker so the first chart does not pay for it """
+    warm_templates()
+
+class RenderPool:
+    """ Worker processes that render charts off the event loop, each with its own chart templates """
+
+    _executor: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def startup(cls):
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(
+                max_workers=max(RENDER_WORKERS, 1),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker
+            )
+            logging.info(f"Started chart render pool with {max(RENDER_WORKERS, 1)} workers")
+
+    @classmethod
+    def shutdown(cls):
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=True, cancel_futures=True)
+            cls._executor = None
+
+    @classmethod
+    def _replace(cls, broken: ProcessPoolExecutor):
+        """ Swap a broken pool for a fresh one, once, however many renders saw it break """
+        if cls._executor is broken:
+            cls._executor = None
+            broken.shutdown(wait=False, cancel_futures=True)
+            cls.startup()
+
+    @classmethod
+    async def render(cls, graph_type: str, data: Union[dict, Series]) -> str:
+        """ Render one chart in a worker process and return its file path """
+        # Cached charts are served without a round-trip to the pool
+        cached_path = graph_cache_path(graph_type, data)
+        try:
+            # Touching marks it recently used for eviction; a chart evicted since is rendered again
+            os.utime(cached_path)
+            return cached_path
+        except FileNotFoundError:
+            pass
+
+        if cls._executor is None:
+            cls.startup()
+        loop = asyncio.get_running_loop()
+        executor = cls._executor
+        try:
+            return await loop.run_in_executor(executor, generate_graph, graph_type, data)
+        except BrokenProcessPool:
+            # A worker died abruptly (OOM kill, crash) and took the pool down with it; retry once on a new pool
+            logging.warning(f"Chart render pool broke while rendering {graph_type}, restarting it")
+            cls._replace(executor)
+            return await loop.run_in_executor(cls._executor, generate_graph, graph_type, data)
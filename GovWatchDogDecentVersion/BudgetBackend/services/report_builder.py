@@ -1,42 +1,124 @@
 import os
+import itertools
 import logging
-
-TEMPLATE_PATH = "templates/report_template.md"
-
-def generate_markdown_report(data: dict, graphs: list, tables: list):
-    """ Generate a Markdown report from the template """
+import string
+import threading
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple
+from services.artifact_store import ArtifactStore
+
+TEMPLATES_DIR = os.getenv("REPORT_TEMPLATES_DIR", "templates")
+# Used when no template is named after the request's report_type
+DEFAULT_TEMPLATE = "report_template"
+TEMPLATE_PATH = os.path.join(TEMPLATES_DIR, f"{DEFAULT_TEMPLATE}.md")
+# Lines of a multi-line section joined per write; bounds memory while keeping write calls few
+RENDER_CHUNK_LINES = 1024
+
+_formatter = string.Formatter()
+
+class CompiledTemplate:
+    """ A template parsed once into literal text and replacement fields, rendered straight to a stream """
+
+    __slots__ = ("parts",)
+
+    def __init__(self, source: str):
+        # (literal text, field name, format spec, conversion) as produced by str.format's own parser
+        self.parts: List[Tuple[str, Optional[str], str, Optional[str]]] = list(_formatter.parse(source))
+
+    def render(self, out: TextIO, values: Dict[str, Any]):
+        """
+        Write the filled template to `out`. A value that is an iterable of strings (other than a
+        str) is written in chunks of lines, so large sections are never joined in memory.
+        """
+        for literal, field_name, format_spec, conversion in self.parts:
+            if literal:
+                out.write(literal)
+            if field_name is None:
+                continue
+            value, _ = _formatter.get_field(field_name, (), values)
+            if isinstance(value, str) or not isinstance(value, Iterable):
+                out.write(_formatter.format_field(_formatter.convert_field(value, conversion), format_spec))
+                continue
+            lines = iter(value)
+            separator = ""
+            while True:
+                chunk = list(itertools.islice(lines, RENDER_CHUNK_LINES))
+                if not chunk:
+                    break
+                out.write(separator)
+                out.write("\n".join(chunk))
+                separator = "\n"
+
+class TemplateCache:
+    """ Compiled templates by name, recompiled only when the file's mtime changes """
+
+    _templates: Dict[str, Tuple[float, CompiledTemplate]] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def path(name: str) -> str:
+        return os.path.join(TEMPLATES_DIR, f"{name}.md")
+
+    @classmethod
+    def get(cls, name: str) -> CompiledTemplate:
+        path = cls.path(name)
+        mtime = os.stat(path).st_mtime
+        cached = cls._templates.get(name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with cls._lock:
+            cached = cls._templates.get(name)
+            if cached is None or cached[0] != mtime:
+                with open(path, "r") as template_file:
+                    cached = (mtime, CompiledTemplate(template_file.read()))
+                cls._templates[name] = cached
+                logging.info(f"Compiled report template: {path}")
+        return cached[1]
+
+def template_name(report_type: Optional[str]) -> str:
+    """ Template for a report type: templates/<report_type>.md when present (e.g. "Full Report" -> full_report.md), else the default """
+    if report_type:
+        name = report_type.strip().lower().replace(" ", "_").replace("-", "_")
+        if name.isidentifier() and os.path.isfile(TemplateCache.path(name)):
+            return name
+    return DEFAULT_TEMPLATE
+
+def generate_markdown_report(
+    data: dict,
+    graphs: list,
+    tables: list,
+    report_type: Optional[str] = None,
+    creator: Optional[str] = None,
+    inputs: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """ Generate a Markdown report from the template for `report_type` and store it as an artifact """
     try:
-        # Load template
-        with open(TEMPLATE_PATH, "r") as template_file:
-            report_template = template_file.read()
-
-        # Generate Graph Markdown Embeds
-        graph_md_links = "\n".join([f"![{os.path.basename(graph)}]({graph})" for graph in graphs])
+        template = TemplateCache.get(template_name(report_type))
 
-        # Format Tables into Markdown
-        table_md = "\n".join([
+        # Graph Markdown embeds and table rows are produced lazily as the report is written
+        graph_md_links = (f"![{os.path.basename(graph)}]({graph})" for graph in graphs)
+        table_md = (
             f"| {row['Fiscal Year']} | {row['Revenue']} | {row['Expenses']} | {row['Surplus/Deficit']} |"
             for row in tables
-        ])
-
-        # Fill Template Placeholders
-        filled_report = report_template.format(
-            report_title=data["report_title"],
-            report_content=data["report_content"],
-            user_name=data["user_name"],
-            company_email=data["company_email"],
-            graph_paths=graph_md_links,
-            table_data=table_md
         )
 
-        # Save Generated Report
-        report_file = os.path.join("reports", f"{data['report_title'].replace(' ', '_')}.md")
-        os.makedirs(os.path.dirname(report_file), exist_ok=True)
-        with open(report_file, "w") as output_file:
-            output_file.write(filled_report)
+        # Stream the report into the content-addressed store; identical reports share one artifact
+        artifact = ArtifactStore.put(
+            lambda out: template.render(out, {
+                "report_title": data["report_title"],
+                "report_content": data["report_content"],
+                "user_name": data["user_name"],
+                "company_email": data["company_email"],
+                "graph_paths": graph_md_links,
+                "table_data": table_md,
+            }),
+            extension=".md",
+            content_type="text/markdown",
+            creator=creator,
+            inputs=inputs
+        )
 
-        logging.info(f"Generated report: {report_file}")
-        return report_file
+        logging.info(f"Generated report artifact: {artifact['id']}")
+        return artifact
 
     except Exception as e:
         logging.error(f"Error generating Markdown report: {str(e)}")
@@ -61,7 +143,7 @@ def generate_markdown_report(data: dict, graphs: list, tables: list):
 #             f"| {row['Fiscal Year']} | {row['Revenue']} | {row['Expenses']} | {row['Surplus/Deficit']} |"
 #             for row in tables
 #         ])
-        
+
 #         # Fill Template Placeholders
 #         filled_report = report_template.format(
 #             report_title=data["report_title"],
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+from models.inputs import ReportRequest
+from models.outputs import ReportOutput
+from models.series import Series
+from services.chart_data import build_chart_series
+from services.completion_cache import data_fingerprint
+from services.data_fetcher import DataFetcher
+from services.graph_generator import CHART_SPECS
+from services.narrative import generate_narrative, stream_narrative
+from services.render_pool import RenderPool
+from services.report_builder import generate_markdown_report
+from utils.errors import BaseAPIError, DatabaseError
+from utils.pagination import PaginationParams
+from utils.validation import DataFilter
+
+REPORT_BASE_URL = os.getenv("REPORT_BASE_URL", "https://budgetwatchdog-production.up.railway.app")
+
+# Upstream sources used by a report, fetched concurrently
+REPORT_ECONOMIC_METRICS = [
+    "gdp_growth", "inflation_rate", "employment_growth", "debt_to_gdp", "bond_yields",
+    "interest_payments", "program_spending"
+]
+REPORT_SOURCE_TIMEOUT = float(os.getenv("REPORT_SOURCE_TIMEOUT", "30"))
+
+# (graph_type, source); economic sources are plotted as whole series, the budget chart from its first item
+REPORT_GRAPHS = [
+    ("net_debt", "budget"),
+    ("gdp_growth", "gdp_growth"),
+    ("inflation_rate", "inflation_rate"),
+    ("employment_growth", "employment_growth"),
+    ("debt_to_gdp", "debt_to_gdp"),
+    ("bond_yields", "bond_yields"),
+    ("interest_payments", "interest_payments"),
+    ("program_spending", "program_spending"),
+]
+
+async def _bounded(coro):
+    """ Await a source fetch with a deadline so one slow upstream cannot stall the report """
+    return await asyncio.wait_for(coro, timeout=REPORT_SOURCE_TIMEOUT)
+
+async def fetch_report_sources(filter_params: DataFilter, pagination: PaginationParams) -> Dict[str, Any]:
+    """
+    Fetch budget data (a page) and economic data (each metric's date-filtered Series) concurrently,
+    returning each result or its exception by source name
+    """
+    names = ["budget"] + REPORT_ECONOMIC_METRICS
+    results = await asyncio.gather(
+        _bounded(DataFetcher.get_budget_data(filter_params, pagination)),
+        *[_bounded(DataFetcher.get_series(metric, filter_params)) for metric in REPORT_ECONOMIC_METRICS],
+        return_exceptions=True
+    )
+    sources = {}
+    for name, result in zip(names, results):
+        if isinstance(result, asyncio.TimeoutError):
+            result = DatabaseError(
+                message=f"Timed out fetching {name} data",
+                details={"timeout": REPORT_SOURCE_TIMEOUT}
+            )
+        if isinstance(result, Exception):
+            logging.warning(f"Report source {name} failed: {result}")
+        sources[name] = result
+    return sources
+
+def _describe_error(exc: Exception) -> str:
+    if isinstance(exc, BaseAPIError):
+        return exc.detail["message"]
+    return str(exc)
+
+def _first_item(result) -> Optional[Dict[str, Any]]:
+    """ First item of a successful paginated source, or None if it failed or is empty """
+    if isinstance(result, Exception) or not result.items:
+        return None
+    return result.items[0]
+
+def source_fingerprint(sources: Dict[str, Any]) -> str:
+    """ Fingerprint of the fetched data, so cached narratives are reused only for unchanged data """
+    return data_fingerprint({
+        name: None if isinstance(result, Exception) else result.fingerprint() if isinstance(result, Series) else result.items
+        for name, result in sources.items()
+    })
+
+def report_title(request: ReportRequest) -> str:
+    return f"Financial Report: {request.government_level} - {request.province or 'Canada'}"
+
+def failed_sources(sources: Dict[str, Any]) -> Dict[str, str]:
+    """ Reason per failed source; raises if no source could be fetched at all """
+    failed = {name: _describe_error(result) for name, result in sources.items() if isinstance(result, Exception)}
+    if len(failed) == len(sources):
+        raise DatabaseError(
+            message="All report data sources failed",
+            details={"errors": failed}
+        )
+    return failed
+
+def build_graph_jobs(sources: Dict[str, Any]) -> List[Tuple[str, Union[dict, Series]]]:
+    """ (graph_type, chart data) for every chart whose source was fetched and is not empty """
+    graph_jobs = []
+    for graph_type, source in REPORT_GRAPHS:
+        result = sources[source]
+        if isinstance(result, Series):
+            if len(result):
+                graph_jobs.append((graph_type, result))
+            continue
+        item = _first_item(result)
+        if item is not None:
+            spec = CHART_SPECS[graph_type]
+            graph_jobs.append((graph_type, {spec["x"]: item[spec["x"]], spec["y"]: item[spec["y"]]}))
+    return graph_jobs
+
+def build_tables(sources: Dict[str, Any]) -> List[Dict[str, Any]]:
+    budget_item = _first_item(sources["budget"])
+    if budget_item is None:
+        return []
+    return [
+        {
+            "Fiscal Year": year,
+            "Revenue": f"{budget_item['revenue'][i]}B",
+            "Expenses": f"{budget_item['expenses'][i]}B",
+            "Surplus/Deficit": f"{budget_item['deficit'][i]}B"
+        } for i, year in enumerate(budget_item["years"])
+    ]
+
+async def render_graphs(graph_jobs: List[Tuple[str, Union[dict, Series]]]) -> List[str]:
+    """ Render all charts in parallel and return their absolute URLs """
+    graph_paths = await asyncio.gather(*[RenderPool.render(graph_type, data) for graph_type, data in graph_jobs])
+    return [f"{REPORT_BASE_URL}/{graph_path}" for graph_path in graph_paths]
+
+def write_report(request: ReportRequest, report_content: str, graphs: List[str], tables: List[dict]) -> str:
+    """ Store the Markdown report as an artifact and return its absolute URL """
+    artifact = generate_markdown_report(
+        {
+            "report_title": report_title(request),
+            "report_content": report_content,
+            "user_name": request.user_name,
+            "company_email": request.company_email,
+        },
+        graphs, tables,
+        report_type=request.report_type,
+        creator=request.company_email,
+        inputs=request.model_dump(exclude={"user_name", "company_email"})
+    )
+    return f"{REPORT_BASE_URL}/artifacts/{artifact['id']}"
+
+async def build_report(
+    request: ReportRequest,
+    filter_params: DataFilter,
+    pagination: PaginationParams,
+    output: str = "images",
+    max_points: Optional[int] = None
+) -> ReportOutput:
+    # Fetch all sources concurrently; a failing source is reported, not fatal
+    sources = await fetch_report_sources(filter_params, pagination)
+    failed = failed_sources(sources)
+
+    # Generate AI report content (cached per prompt and data fingerprint)
+    report_content = await generate_narrative(request, source_fingerprint(sources))
+
+    # Generate graphs with absolute URLs (or their chart data), skipping sources that failed
+    graph_jobs = build_graph_jobs(sources)
+    graphs, chart_data = [], None
+    if output == "data":
+        chart_data = [build_chart_series(graph_type, data, max_points) for graph_type, data in graph_jobs]
+    else:
+        graphs = await render_graphs(graph_jobs)
+
+    tables = build_tables(sources)
+
+    return ReportOutput(
+        file_path=write_report(request, report_content, graphs, tables),
+        graphs=graphs,
+        tables=tables,
+        chart_data=chart_data,
+        failed_sources=failed
+    )
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def stream_report(
+    request: ReportRequest,
+    filter_params: DataFilter,
+    pagination: PaginationParams,
+    output: str = "images",
+    max_points: Optional[int] = None
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for one report. Once the data is fetched, the narrative is streamed as
+    `token` events (one event on a completion cache hit) while `tables` and `graphs`/`chart_data`
+    follow as soon as they are ready, then `report` with the Markdown URL, or `error` if the report could not be built.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    sources_task = asyncio.create_task(fetch_report_sources(filter_params, pagination))
+
+    async def narrate() -> str:
+        # The completion cache is keyed on the data, so wait for it before asking the model
+        sources = await sources_task
+        parts = []
+        async for text in stream_narrative(request, source_fingerprint(sources)):
+            parts.append(text)
+            await queue.put(("event", ("token", {"text": text})))
+        return "".join(parts)
+
+    async def assemble() -> Tuple[List[str], List[dict], Dict[str, str]]:
+        sources = await sources_task
+        failed = failed_sources(sources)
+        tables = build_tables(sources)
+        await queue.put(("event", ("tables", {"tables": tables, "failed_sources": failed})))
+
+        graph_jobs = build_graph_jobs(sources)
+        graphs = []
+        if output == "data":
+            chart_data = [build_chart_series(graph_type, data, max_points) for graph_type, data in graph_jobs]
+            await queue.put(("event", ("chart_data", {"chart_data": chart_data})))
+        else:
+            graphs = await render_graphs(graph_jobs)
+            await queue.put(("event", ("graphs", {"graphs": graphs})))
+        return graphs, tables, failed
+
+    async def run(step):
+        try:
+            result = await step()
+        except Exception as e:
+            await queue.put(("failed", e))
+            return None
+        await queue.put(("done", None))
+        return result
+
+    yield _sse("start", {"report_title": report_title(request)})
+    tasks = [asyncio.create_task(run(narrate)), asyncio.create_task(run(assemble))]
+    try:
+        finished = 0
+        while finished < len(tasks):
+            kind, payload = await queue.get()
+            if kind == "event":
+                yield _sse(*payload)
+            elif kind == "done":
+                finished += 1
+            else:
+                logging.error(f"Streaming report failed: {payload}")
+                yield _sse("error", {"message": "Failed to generate report", "details": {"error": _describe_error(payload)}})
+                return
+
+        report_content = tasks[0].result()
+        graphs, tables, failed = tasks[1].result()
+        file_path = write_report(request, report_content, graphs, tables)
+        yield _sse("report", {"file_path": file_path, "graphs": graphs, "failed_sources": failed})
+    finally:
+        # The client went away or the report finished; stop any work still running
+        for task in [sources_task, *tasks]:
+            task.cancel()
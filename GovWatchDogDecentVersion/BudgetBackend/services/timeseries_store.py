@@ -0,0 +1,208 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+TIMESERIES_DB_PATH = os.getenv("TIMESERIES_DB_PATH", "data/timeseries.db")
+# Upstream series change monthly at most; only look for new observations this often
+TIMESERIES_REFRESH_INTERVAL = int(os.getenv("TIMESERIES_REFRESH_INTERVAL", "21600"))
+
+SORTABLE_FIELDS = {"date": "date", "value": "value"}
+
+class TimeSeriesStore:
+    """ On-disk SQLite store of normalized observations keyed by (source, series, geography) """
+
+    _conn: Optional[sqlite3.Connection] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def connection(cls) -> sqlite3.Connection:
+        if cls._conn is None:
+            with cls._lock:
+                if cls._conn is None:
+                    directory = os.path.dirname(TIMESERIES_DB_PATH)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    conn = sqlite3.connect(TIMESERIES_DB_PATH, check_same_thread=False, isolation_level=None)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                    conn.execute(
+                        """CREATE TABLE IF NOT EXISTS observations (
+                            source TEXT NOT NULL,
+                            series TEXT NOT NULL,
+                            geo TEXT NOT NULL,
+                            date TEXT NOT NULL,
+                            value REAL NOT NULL,
+                            PRIMARY KEY (source, series, geo, date)
+                        ) WITHOUT ROWID"""
+                    )
+                    conn.execute(
+                        """CREATE TABLE IF NOT EXISTS series_state (
+                            source TEXT NOT NULL,
+                            series TEXT NOT NULL,
+                            geo TEXT NOT NULL,
+                            refreshed_at REAL NOT NULL,
+                            changed_at REAL,
+                            PRIMARY KEY (source, series, geo)
+                        ) WITHOUT ROWID"""
+                    )
+                    # Stores created before changed_at was tracked
+                    columns = [row[1] for row in conn.execute("PRAGMA table_info(series_state)")]
+                    if "changed_at" not in columns:
+                        conn.execute("ALTER TABLE series_state ADD COLUMN changed_at REAL")
+                    cls._conn = conn
+        return cls._conn
+
+    @classmethod
+    def close(cls):
+        with cls._lock:
+            if cls._conn is not None:
+                cls._conn.close()
+                cls._conn = None
+
+    @classmethod
+    def upsert(cls, source: str, series: str, geo: str, observations: List[Tuple[str, float]]):
+        """ Insert or update observations; the latest upstream value for a date wins """
+        conn = cls.connection()
+        now = time.time()
+        with cls._lock:
+            conn.execute("BEGIN")
+            try:
+                # Only new dates and revised values count as changes
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT INTO observations (source, series, geo, date, value) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (source, series, geo, date) DO UPDATE SET value = excluded.value "
+                    "WHERE value != excluded.value",
+                    [(source, series, geo, date, value) for date, value in observations]
+                )
+                changed = conn.total_changes > before
+                conn.execute(
+                    "INSERT INTO series_state (source, series, geo, refreshed_at, changed_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (source, series, geo) DO UPDATE SET refreshed_at = excluded.refreshed_at, "
+                    "changed_at = COALESCE(?, series_state.changed_at, excluded.refreshed_at)",
+                    (source, series, geo, now, now, now if changed else None)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    @classmethod
+    def last_date(cls, source: str, series: str, geo: str) -> Optional[str]:
+        row = cls.connection().execute(
+            "SELECT MAX(date) FROM observations WHERE source = ? AND series = ? AND geo = ?",
+            (source, series, geo)
+        ).fetchone()
+        return row[0] if row else None
+
+    @classmethod
+    def is_fresh(cls, source: str, series: str, geo: str) -> bool:
+        row = cls.connection().execute(
+            "SELECT refreshed_at FROM series_state WHERE source = ? AND series = ? AND geo = ?",
+            (source, series, geo)
+        ).fetchone()
+        return bool(row) and time.time() - row[0] < TIMESERIES_REFRESH_INTERVAL
+
+    @classmethod
+    def state(
+        cls,
+        source: str,
+        series: str,
+        geo: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """ Cheap version of a (date-filtered) series for HTTP validators: row count, last date and last change time """
+        clause, args = cls._where(start_date, end_date)
+        conn = cls.connection()
+        count, last_date = conn.execute(
+            f"SELECT COUNT(*), MAX(date) FROM observations WHERE {clause}",
+            (source, series, geo, *args)
+        ).fetchone()
+        row = conn.execute(
+            "SELECT changed_at FROM series_state WHERE source = ? AND series = ? AND geo = ?",
+            (source, series, geo)
+        ).fetchone()
+        return {"count": count, "last_date": last_date, "changed_at": row[0] if row else None}
+
+    @staticmethod
+    def _where(start_date: Optional[str], end_date: Optional[str]) -> Tuple[str, list]:
+        clause, args = "source = ? AND series = ? AND geo = ?", []
+        if start_date:
+            clause += " AND date >= ?"
+            args.append(start_date)
+        if end_date:
+            clause += " AND date <= ?"
+            args.append(end_date)
+        return clause, args
+
+    @classmethod
+    def count(
+        cls,
+        source: str,
+        series: str,
+        geo: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> int:
+        clause, args = cls._where(start_date, end_date)
+        return cls.connection().execute(
+            f"SELECT COUNT(*) FROM observations WHERE {clause}",
+            (source, series, geo, *args)
+        ).fetchone()[0]
+
+    @classmethod
+    def query(
+        cls,
+        source: str,
+        series: str,
+        geo: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        offset: int = 0,
+        limit: int = -1,
+        sort_by: Optional[str] = None,
+        sort_order: Optional[str] = "asc"
+    ) -> List[Tuple[str, float]]:
+        clause, args = cls._where(start_date, end_date)
+        order_field = SORTABLE_FIELDS.get(sort_by or "date", "date")
+        direction = "DESC" if sort_order == "desc" else "ASC"
+        return cls.connection().execute(
+            f"SELECT date, value FROM observations WHERE {clause} "
+            f"ORDER BY {order_field} {direction}, date {direction} LIMIT ? OFFSET ?",
+            (source, series, geo, *args, limit, offset)
+        ).fetchall()
+
+    @classmethod
+    def iter_query(
+        cls,
+        source: str,
+        series: str,
+        geo: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        chunk_size: int = 1000
+    ) -> Iterator[List[Tuple[str, float]]]:
+        """
+        Date-ordered rows in chunks of `chunk_size`, read through a dedicated read-only connection.
+        The open statement pins one WAL snapshot, so a long export sees a consistent series while
+        refreshes keep writing, and only one chunk is in memory at a time.
+        """
+        cls.connection()
+        clause, args = cls._where(start_date, end_date)
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(TIMESERIES_DB_PATH))}?mode=ro", uri=True, check_same_thread=False)
+        try:
+            cursor = conn.execute(
+                f"SELECT date, value FROM observations WHERE {clause} ORDER BY date",
+                (source, series, geo, *args)
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
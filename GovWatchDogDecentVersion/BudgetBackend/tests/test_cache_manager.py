@@ -0,0 +1,92 @@
+import asyncio
+from typing import Any, Optional, Tuple
+import pytest
+from services.cache_manager import CacheManager, LRUCache
+from utils.singleflight import SingleFlight
+
+KEY = "gdp_growth"
+
+class Worker:
+    """ One uvicorn worker's in-process cache state; Redis is shared between workers """
+
+    def __init__(self, monkeypatch):
+        self.monkeypatch = monkeypatch
+        self.l1 = LRUCache(16)
+        self.last_good = LRUCache(16)
+        self.refreshing = {}
+        self.flight = SingleFlight()
+        # Every worker holds the same entry, written at the same time, now past its TTL
+        self.l1.set(KEY, "stale", -1)
+
+    def activate(self):
+        self.monkeypatch.setattr(CacheManager, "l1", self.l1)
+        self.monkeypatch.setattr(CacheManager, "last_good", self.last_good)
+        self.monkeypatch.setattr(CacheManager, "_refreshing", self.refreshing)
+        self.monkeypatch.setattr(CacheManager, "_flight", self.flight)
+
+    async def stale_hit(self, loader) -> Tuple[Any, Optional[asyncio.Task]]:
+        """ A request that finds the stale entry, and the background refresh it starts """
+        self.activate()
+        value = await CacheManager.get_or_load(KEY, loader, ttl=60)
+        return value, self.refreshing.get(KEY)
+
+@pytest.fixture
+def workers(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setattr(CacheManager, "redis_client", fakeredis.aioredis.FakeRedis())
+    return Worker(monkeypatch), Worker(monkeypatch)
+
+def test_stale_key_is_refreshed_once_across_workers(workers):
+    first, second = workers
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return "fresh"
+
+    async def scenario():
+        value, refresh = await first.stale_hit(loader)
+        assert value == "stale"
+        await refresh
+        # The second worker finds the first worker's value in Redis instead of loading it again
+        value, refresh = await second.stale_hit(loader)
+        assert value == "stale"
+        await refresh
+        return second.l1.get(KEY)[0]
+
+    assert asyncio.run(scenario()) == "fresh"
+    assert len(calls) == 1
+
+def test_stale_key_is_not_recomputed_while_another_worker_holds_the_lock(workers):
+    first, second = workers
+    calls = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def loader():
+            calls.append(1)
+            await release.wait()
+            return "fresh"
+
+        _, first_refresh = await first.stale_hit(loader)
+        await asyncio.sleep(0.01)
+        value, second_refresh = await second.stale_hit(loader)
+        # Bounded, so a second load blocked on `release` fails the test instead of hanging it
+        await asyncio.wait_for(second_refresh, 1)
+        # The second worker skipped the load and keeps serving its stale value
+        assert value == "stale" and second.l1.get(KEY)[0] == "stale"
+
+        first.activate()
+        release.set()
+        await first_refresh
+        assert first.l1.get(KEY)[0] == "fresh"
+
+        # Once the value is in Redis, the second worker's next refresh picks it up
+        _, second_refresh = await second.stale_hit(loader)
+        await second_refresh
+        return second.l1.get(KEY)[0]
+
+    assert asyncio.run(scenario()) == "fresh"
+    assert len(calls) == 1
+    assert CacheManager.stats["l2_hits"] >= 1
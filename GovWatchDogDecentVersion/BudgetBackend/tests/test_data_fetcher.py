@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from models.series import Series
+from services.data_fetcher import DataFetcher
+from services.datasets import SeriesDataset
+from utils.errors import ValidationError
+from utils.pagination import PaginationParams, encode_cursor
+from utils.validation import DataFilter
+
+PROVINCIAL = DataFilter(government_level="Province", province="Ontario")
+
+@pytest.mark.parametrize("call", [
+    lambda: DataFetcher.get_series("debt_to_gdp", PROVINCIAL),
+    lambda: DataFetcher.series_state("debt_to_gdp", PROVINCIAL),
+    lambda: DataFetcher.series_chunks("debt_to_gdp", PROVINCIAL),
+])
+def test_derived_metric_outside_its_levels_is_a_client_error(call):
+    with pytest.raises(ValidationError) as raised:
+        asyncio.run(call())
+    assert raised.value.status_code == 400
+    assert raised.value.detail["details"] == {"government_level": "Province"}
+
+@pytest.mark.parametrize("call", [
+    lambda: DataFetcher.get_series("gdp_growth", DataFilter(), transform="cube_root"),
+    lambda: DataFetcher.series_state("gdp_growth", DataFilter(), transform="cube_root"),
+    lambda: DataFetcher.series_chunks("gdp_growth", DataFilter(), transform="cube_root"),
+])
+def test_unknown_transform_is_a_client_error(call):
+    with pytest.raises(ValidationError) as raised:
+        asyncio.run(call())
+    assert raised.value.status_code == 400
+    assert "supported_transforms" in raised.value.detail["details"]
+
+@pytest.fixture
+def stored_series(monkeypatch):
+    """ gdp_growth served from an in-memory dataset instead of the store """
+    dataset = SeriesDataset(Series.from_columns("gdp_growth", [f"2024-{m:02d}-01" for m in range(1, 13)], [float(m) for m in range(12)]))
+
+    async def stored_dataset(metric):
+        return dataset
+
+    async def series_state(metric, filter_params, transform=None, window=None):
+        return {"count": len(dataset), "last_date": "2024-12-01", "fingerprint": "test"}
+
+    monkeypatch.setattr(DataFetcher, "_stored_dataset", staticmethod(stored_dataset))
+    monkeypatch.setattr(DataFetcher, "series_state", staticmethod(series_state))
+    return dataset
+
+def _page(cursor=None):
+    return asyncio.run(DataFetcher.fetch_economic_data(
+        "gdp_growth", DataFilter(), PaginationParams(page=1, page_size=5, sort_order="asc", cursor=cursor, include_total=True)
+    ))
+
+def test_cursor_pages_follow_each_other(stored_series):
+    first = _page()
+    second = _page(first.next_cursor)
+    last = _page(second.next_cursor)
+    assert first.items.date_labels() == [f"2024-{m:02d}-01" for m in range(1, 6)]
+    assert second.items.date_labels() == [f"2024-{m:02d}-01" for m in range(6, 11)]
+    assert last.items.date_labels() == ["2024-11-01", "2024-12-01"]
+    assert last.next_cursor is None and not last.has_next
+
+@pytest.mark.parametrize("cursor", [
+    "garbage",
+    # A real cursor, but for another sort order
+    encode_cursor({"s": "gdp_growth::", "k": "value", "o": "asc", "d": "2024-05-01", "v": 4.0}),
+    # Right scope, unusable position
+    encode_cursor({"s": "gdp_growth::", "k": "date", "o": "asc", "d": "yesterday", "v": 1.0}),
+])
+def test_bad_cursor_is_a_client_error(stored_series, cursor):
+    with pytest.raises(ValidationError) as raised:
+        _page(cursor)
+    assert raised.value.status_code == 400
+
+def test_bad_cursor_is_a_400_from_the_route(stored_series):
+    from fastapi.testclient import TestClient
+    import main
+
+    response = TestClient(main.app).get("/api/data", params={"government_level": "Federal", "metric": "gdp_growth", "cursor": "garbage"})
+    assert response.status_code == 400
+    assert response.json()["error_code"] == "VALIDATION_ERROR"
@@ -0,0 +1,38 @@
+from fastapi import Request
+from utils.http_cache import DATA_CACHE_CONTROL, encoded_etag, is_not_modified, make_etag, not_modified_response, validator_headers
+from utils.responses import fast_json_response
+
+ETAG = make_etag("gdp_growth", {"count": 12})
+BODY = {"items": [{"date": f"2024-01-{day:02d}", "value": day * 1.5} for day in range(1, 29)] * 4}
+
+def _request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/api/data", "query_string": b"", "headers": raw})
+
+def test_each_encoding_gets_its_own_etag():
+    headers = validator_headers(ETAG, None, DATA_CACHE_CONTROL)
+    identity = fast_json_response(_request(), BODY, headers)
+    gzipped = fast_json_response(_request(accept_encoding="gzip"), BODY, headers)
+    assert identity.headers["etag"] == ETAG
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] == encoded_etag(ETAG, "gzip") == ETAG[:-1] + '-gzip"'
+    assert gzipped.headers["vary"] == "Accept-Encoding"
+
+def test_small_bodies_keep_the_plain_etag():
+    response = fast_json_response(_request(accept_encoding="gzip"), {"items": []}, {"ETag": ETAG})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == ETAG
+
+def test_any_representation_of_the_current_version_is_not_modified():
+    for tag in (ETAG, encoded_etag(ETAG, "gzip"), "W/" + encoded_etag(ETAG, "br"), '"other", ' + ETAG, "*"):
+        assert is_not_modified(_request(if_none_match=tag).headers, ETAG, None)
+    assert not is_not_modified(_request(if_none_match='"other"').headers, ETAG, None)
+    assert not is_not_modified(_request(if_none_match=encoded_etag(make_etag("older"), "gzip")).headers, ETAG, None)
+
+def test_not_modified_names_the_clients_representation_and_varies():
+    held = encoded_etag(ETAG, "gzip")
+    response = not_modified_response(_request(if_none_match=held, accept_encoding="gzip"), ETAG, None, DATA_CACHE_CONTROL, vary="Accept-Encoding")
+    assert response.status_code == 304
+    assert response.headers["etag"] == held
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert not_modified_response(_request(if_none_match='"other"'), ETAG, None, DATA_CACHE_CONTROL) is None
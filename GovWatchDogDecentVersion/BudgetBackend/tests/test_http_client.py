@@ -0,0 +1,141 @@
+import asyncio
+from collections import defaultdict
+import httpx
+import pytest
+from services import circuit_breaker
+from services.circuit_breaker import CircuitBreaker
+from services.http_client import HttpClientPool
+from utils.errors import UpstreamUnavailableError
+
+URL = "https://upstream.test/data"
+
+@pytest.fixture(autouse=True)
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(HttpClientPool, "_clients", {})
+    monkeypatch.setattr(HttpClientPool, "_breakers", {})
+    monkeypatch.setattr(HttpClientPool, "_stats", defaultdict(lambda: {"requests": 0, "failures": 0, "timeouts": 0, "retries": 0, "hedged": 0, "hedge_wins": 0}))
+
+def _serve(monkeypatch, handler):
+    monkeypatch.setattr(HttpClientPool, "_create_client", classmethod(lambda cls: httpx.AsyncClient(transport=httpx.MockTransport(handler))))
+
+def _open_breaker() -> CircuitBreaker:
+    """ The host's breaker, tripped and already past its reset timeout """
+    breaker = HttpClientPool.breaker_for(URL)
+    breaker.reset_timeout = 0
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    return breaker
+
+def test_breaker_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN and breaker.trips == 1
+    assert not breaker.allow()
+    assert breaker.short_circuited == 1
+    assert breaker.retry_after() > 0
+
+def test_half_open_admits_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == circuit_breaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+def test_failed_probe_reopens_and_released_probe_can_be_retried():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN and breaker.trips == 2
+
+def test_attempt_counts_5xx_against_the_breaker(monkeypatch):
+    _serve(monkeypatch, lambda request: httpx.Response(503))
+    breaker = HttpClientPool.breaker_for(URL)
+
+    async def scenario():
+        for _ in range(breaker.failure_threshold):
+            response = await HttpClientPool._attempt("GET", URL, None, None, True)
+            assert response.status_code == 503
+        with pytest.raises(UpstreamUnavailableError):
+            await HttpClientPool._attempt("GET", URL, None, None, True)
+
+    asyncio.run(scenario())
+    assert breaker.state == circuit_breaker.OPEN
+    assert HttpClientPool._stats["https://upstream.test"]["failures"] == breaker.failure_threshold
+
+def test_unexpected_error_during_probe_settles_the_breaker(monkeypatch):
+    def handler(request):
+        # A body that does not match its Content-Encoding fails to decode
+        return httpx.Response(200, headers={"Content-Encoding": "gzip"}, stream=httpx.ByteStream(b"not gzip"))
+
+    _serve(monkeypatch, handler)
+    breaker = _open_breaker()
+
+    async def scenario():
+        with pytest.raises(httpx.DecodingError):
+            await HttpClientPool._attempt("GET", URL, None, None, True)
+
+    asyncio.run(scenario())
+    # The probe failed rather than staying reserved, so the breaker will probe again
+    assert breaker.state == circuit_breaker.OPEN
+    assert breaker.allow()
+
+def test_cancelled_probe_is_released(monkeypatch):
+    async def handler(request):
+        await asyncio.sleep(10)
+        return httpx.Response(200)
+
+    _serve(monkeypatch, handler)
+    breaker = _open_breaker()
+
+    async def scenario():
+        call = asyncio.ensure_future(HttpClientPool._attempt("GET", URL, None, None, True))
+        await asyncio.sleep(0.01)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+    asyncio.run(scenario())
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    assert breaker.allow()
+
+def test_hedge_backup_wins_when_primary_is_slow():
+    calls = []
+
+    async def send():
+        calls.append(asyncio.current_task())
+        await asyncio.sleep(10 if len(calls) == 1 else 0)
+        return httpx.Response(200, text=str(len(calls)))
+
+    async def scenario():
+        return await HttpClientPool._hedged("https://upstream.test", send, 0.01)
+
+    response = asyncio.run(scenario())
+    assert response.text == "2"
+    assert calls[0].cancelled()
+    assert HttpClientPool._stats["https://upstream.test"]["hedge_wins"] == 1
+
+def test_cancelling_before_the_hedge_cancels_the_primary():
+    calls = []
+
+    async def send():
+        calls.append(asyncio.current_task())
+        await asyncio.sleep(10)
+        return httpx.Response(200)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(HttpClientPool._hedged("https://upstream.test", send, 5), 0.01)
+        await asyncio.sleep(0.01)
+        # Checked while the loop is still running; asyncio.run would cancel an orphan on exit anyway
+        return calls[0].cancelled()
+
+    assert asyncio.run(scenario())
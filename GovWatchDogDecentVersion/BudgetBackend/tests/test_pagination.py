@@ -0,0 +1,24 @@
+import base64
+import pytest
+from utils.errors import ValidationError
+from utils.pagination import decode_cursor, encode_cursor
+
+def test_cursor_round_trip():
+    position = {"s": "gdp_growth::", "k": "value", "o": "desc", "d": "2024-01-01", "v": -0.25}
+    cursor = encode_cursor(position)
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+    assert decode_cursor(cursor) == position
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    "abc",
+    base64.urlsafe_b64encode(b"{not json").decode(),
+    # Valid JSON, but not a position
+    encode_cursor([1, 2]),
+    encode_cursor("2024-01-01"),
+])
+def test_malformed_cursor_is_a_validation_error(cursor):
+    with pytest.raises(ValidationError) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+    assert raised.value.detail["details"] == {"cursor": cursor}
@@ -0,0 +1,101 @@
+import asyncio
+from collections import defaultdict
+import pytest
+from services import rate_limiter
+from services.cache_manager import CacheManager
+from services.rate_limiter import RateLimiter, TokenBucket
+from utils.errors import UpstreamRateLimitedError
+
+URL = "https://upstream.test/data"
+
+@pytest.fixture(autouse=True)
+def fresh_limiter(monkeypatch):
+    monkeypatch.setattr(RateLimiter, "_buckets", {})
+    monkeypatch.setattr(RateLimiter, "_stats", defaultdict(lambda: {"acquired": 0, "waited_seconds": 0.0, "throttled": 0, "rejected": 0}))
+    monkeypatch.setattr(rate_limiter, "UPSTREAM_RATE_LIMITS", {"upstream.test": {"rate": 2, "burst": 2}})
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_MAX_WAIT", 1.0)
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", _no_sleep)
+
+async def _no_sleep(delay):
+    return None
+
+def test_bucket_paces_after_the_burst():
+    bucket = TokenBucket(rate=2, burst=2)
+    waits = [bucket.reserve(max_wait=10) for _ in range(4)]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.5, abs=0.01)
+    assert waits[3] == pytest.approx(1.0, abs=0.01)
+
+def test_rejected_reservations_take_no_token():
+    bucket = TokenBucket(rate=2, burst=2)
+    for _ in range(100):
+        bucket.reserve(max_wait=1.0)
+    # Two free tokens, then two queued ones (0.5s and 1s); every later caller is turned away
+    assert bucket.tokens >= -2.01
+    assert bucket.reserve(max_wait=1.0) > 1.0
+
+def test_throttle_blocks_and_recover_restores_the_rate():
+    bucket = TokenBucket(rate=10, burst=10)
+    bucket.throttle(retry_after=5)
+    assert bucket.rate == 5
+    assert bucket.reserve(max_wait=10) == pytest.approx(5, abs=0.05)
+    for _ in range(20):
+        bucket.recover()
+    assert bucket.rate == 10
+
+def test_acquire_rejects_beyond_max_wait_in_memory():
+    async def scenario():
+        for _ in range(4):
+            await RateLimiter.acquire(URL)
+        with pytest.raises(UpstreamRateLimitedError) as raised:
+            await RateLimiter.acquire(URL)
+        return raised.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 429
+    assert error.headers["Retry-After"]
+    stats = RateLimiter._stats["upstream.test"]
+    assert stats["acquired"] == 4 and stats["rejected"] == 1
+
+def test_shared_bucket_stays_bounded_under_overload(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_BACKEND", "redis")
+    monkeypatch.setattr(CacheManager, "redis_client", fakeredis.aioredis.FakeRedis())
+
+    async def scenario():
+        acquired = rejected = 0
+        for _ in range(50):
+            try:
+                await RateLimiter.acquire(URL)
+                acquired += 1
+            except UpstreamRateLimitedError:
+                rejected += 1
+        tokens = float(await CacheManager.redis_client.hget(f"{rate_limiter.CACHE_PREFIX}:ratelimit:upstream.test", "tokens"))
+        return acquired, rejected, tokens
+
+    acquired, rejected, tokens = asyncio.run(scenario())
+    assert RateLimiter.redis_errors == 0
+    assert acquired == 4 and rejected == 46
+    # Rejected calls gave nothing away, so the debt is only the two queued tokens
+    assert tokens >= -2.01
+
+def test_shared_throttle_and_recover(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_BACKEND", "redis")
+    monkeypatch.setattr(CacheManager, "redis_client", fakeredis.aioredis.FakeRedis())
+
+    async def scenario():
+        await RateLimiter.throttled(URL, retry_after=30)
+        throttled_rate = RateLimiter.bucket_for("upstream.test").rate
+        with pytest.raises(UpstreamRateLimitedError):
+            await RateLimiter.acquire(URL)
+        for _ in range(40):
+            await RateLimiter.succeeded(URL)
+        return throttled_rate, RateLimiter.bucket_for("upstream.test").rate
+
+    throttled_rate, recovered_rate = asyncio.run(scenario())
+    assert RateLimiter.redis_errors == 0
+    assert throttled_rate == 1
+    assert recovered_rate == 2
@@ -0,0 +1,69 @@
+import asyncio
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from services import render_pool
+from services.render_pool import RenderPool
+
+class FakeExecutor:
+    """ Runs calls inline, or fails them the way a pool whose worker died does """
+
+    def __init__(self, broken: bool):
+        self.broken = broken
+        self.calls = 0
+        self.was_shutdown = False
+
+    def submit(self, fn, *args):
+        self.calls += 1
+        future = Future()
+        if self.broken:
+            future.set_exception(BrokenProcessPool("A worker process terminated abruptly"))
+        else:
+            future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.was_shutdown = True
+
+@pytest.fixture
+def pools(monkeypatch, tmp_path):
+    created = []
+
+    def startup(cls):
+        if cls._executor is None:
+            cls._executor = FakeExecutor(broken=not created)
+            created.append(cls._executor)
+
+    monkeypatch.setattr(RenderPool, "_executor", None)
+    monkeypatch.setattr(RenderPool, "startup", classmethod(startup))
+    monkeypatch.setattr(render_pool, "graph_cache_path", lambda graph_type, data: str(tmp_path / f"{graph_type}.png"))
+    monkeypatch.setattr(render_pool, "generate_graph", lambda graph_type, data: f"rendered {graph_type}")
+    return created
+
+def test_broken_pool_is_replaced_and_the_render_retried(pools):
+    assert asyncio.run(RenderPool.render("gdp", {})) == "rendered gdp"
+    broken, fresh = pools
+    assert broken.was_shutdown and broken.calls == 1
+    assert RenderPool._executor is fresh and fresh.calls == 1
+
+def test_concurrent_renders_replace_a_broken_pool_once(pools):
+    async def scenario():
+        return await asyncio.gather(*[RenderPool.render(f"chart{i}", {}) for i in range(3)])
+
+    assert asyncio.run(scenario()) == ["rendered chart0", "rendered chart1", "rendered chart2"]
+    assert len(pools) == 2 and pools[1].calls == 3
+
+def test_cached_chart_is_served_without_the_pool(pools, tmp_path):
+    cached = tmp_path / "gdp.png"
+    cached.write_bytes(b"png")
+    assert asyncio.run(RenderPool.render("gdp", {})) == str(cached)
+    assert pools == []
+
+def test_chart_evicted_while_being_served_is_rendered_again(pools, monkeypatch, tmp_path):
+    (tmp_path / "gdp.png").write_bytes(b"png")
+
+    def evicted(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(render_pool.os, "utime", evicted)
+    assert asyncio.run(RenderPool.render("gdp", {})) == "rendered gdp"
@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from utils.singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        return await asyncio.gather(*[flight.do("key", load) for _ in range(5)])
+
+    assert asyncio.run(main()) == ["value"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"executions": 1, "coalesced": 4, "in_flight": 0}
+
+def test_cancelling_the_leader_does_not_cancel_followers():
+    flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("key", load))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", load))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "value"
+
+def test_cancelling_a_follower_does_not_cancel_the_leader():
+    flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("key", load))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", load))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == "value"
+
+def test_errors_reach_every_caller_and_clear_the_key():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def main():
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert not flight.in_flight("key")
+        # The next call runs again instead of reusing the failure
+        return await flight.do("key", lambda: asyncio.sleep(0, result="recovered"))
+
+    assert asyncio.run(main()) == "recovered"
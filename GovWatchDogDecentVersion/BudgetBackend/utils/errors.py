@@ -7,7 +7,8 @@ class BaseAPIError(HTTPException):
         status_code: int,
         message: str,
         error_code: str,
-        details: Optional[Dict[str, Any]] = None
+        details: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
     ):
         super().__init__(
             status_code=status_code,
@@ -15,7 +16,8 @@ class BaseAPIError(HTTPException):
                 "message": message,
                 "error_code": error_code,
                 "details": details or {}
-            }
+            },
+            headers=headers
         )
 
 class ValidationError(BaseAPIError):
@@ -43,4 +45,36 @@ class DatabaseError(BaseAPIError):
             message=message,
             error_code="DATABASE_ERROR",
             details=details
-        )
\ No newline at end of file
+        )
+
+class UpstreamError(BaseAPIError):
+    """ An upstream API is down or throttling us; passed through as-is rather than wrapped in a DatabaseError """
+
+    def __init__(self, status_code: int, message: str, error_code: str, details: Optional[Dict[str, Any]] = None, retry_after: Optional[float] = None):
+        super().__init__(
+            status_code=status_code,
+            message=message,
+            error_code=error_code,
+            details=details,
+            headers={"Retry-After": str(max(int(retry_after + 0.999), 1))} if retry_after is not None else None
+        )
+
+class UpstreamUnavailableError(UpstreamError):
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None, retry_after: Optional[float] = None):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            message=message,
+            error_code="UPSTREAM_UNAVAILABLE",
+            details=details,
+            retry_after=retry_after
+        )
+
+class UpstreamRateLimitedError(UpstreamError):
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None, retry_after: Optional[float] = None):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            message=message,
+            error_code="UPSTREAM_RATE_LIMITED",
+            details=details,
+            retry_after=retry_after
+        )
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+from fastapi import Request, Response, status
+from fastapi.staticfiles import StaticFiles
+from starlette.responses import FileResponse
+from starlette.datastructures import Headers
+from starlette.types import Scope
+
+# Cache-Control per route family
+DATA_CACHE_CONTROL = os.getenv("DATA_CACHE_CONTROL", "public, max-age=300, stale-while-revalidate=3600")
+# Artifacts and chart images are content-addressed, so their bytes never change under a URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+NO_STORE = "no-store"
+# Content codings a response may be sent in; each gets its own ETag (see encoded_etag)
+ETAG_ENCODINGS = ("gzip", "br")
+
+def make_etag(*parts: Any) -> str:
+    """ Strong ETag over the JSON form of `parts` """
+    return '"' + hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:32] + '"'
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """ ETag of the `encoding` (gzip, br) representation: each encoding has its own bytes, so its own tag """
+    if not encoding or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def observation_datetime(value: Optional[str]) -> Optional[datetime]:
+    """ Latest observation date (YYYY-MM-DD or YYYY-MM) as a UTC datetime for Last-Modified """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value if len(value) > 7 else f"{value}-01").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def validator_headers(etag: str, last_modified: Optional[datetime], cache_control: str) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+def _matching_tag(if_none_match: str, etag: str) -> Optional[str]:
+    """ The If-None-Match tag naming `etag` or one of its encoded representations, if any """
+    variants = {etag, *(encoded_etag(etag, encoding) for encoding in ETAG_ENCODINGS)}
+    for tag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        if tag == "*":
+            return etag
+        if tag in variants:
+            return tag
+    return None
+
+def is_not_modified(request_headers: Headers, etag: str, last_modified: Optional[datetime]) -> bool:
+    """ RFC 9110 precondition: If-None-Match wins; If-Modified-Since is only consulted without it """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return _matching_tag(if_none_match, etag) is not None
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def not_modified_response(
+    request: Request,
+    etag: str,
+    last_modified: Optional[datetime],
+    cache_control: str,
+    vary: Optional[str] = None
+) -> Optional[Response]:
+    """
+    A bodyless 304 when the client's copy is current, else None. The 304 carries the tag of the
+    representation the client holds, and the same Vary as the full response.
+    """
+    if request.method not in ("GET", "HEAD") or not is_not_modified(request.headers, etag, last_modified):
+        return None
+    if_none_match = request.headers.get("if-none-match")
+    headers = validator_headers(_matching_tag(if_none_match, etag) if if_none_match else etag, last_modified, cache_control)
+    if vary:
+        headers["Vary"] = vary
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+class ContentAddressedStaticFiles(StaticFiles):
+    """ Static files named <name>-<sha256>.<ext>: the hash is the strong ETag and responses are cacheable forever """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        digest = os.path.splitext(os.path.basename(full_path))[0].rsplit("-", 1)[-1]
+        response.headers["etag"] = f'"{digest}"'
+        response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        last_modified = datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc)
+        if is_not_modified(Headers(scope=scope), response.headers["etag"], last_modified):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={
+                "etag": response.headers["etag"],
+                "cache-control": IMMUTABLE_CACHE_CONTROL,
+                "last-modified": response.headers["last-modified"],
+            })
+        return response
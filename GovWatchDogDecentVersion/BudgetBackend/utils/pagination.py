@@ -1,6 +1,10 @@
-from typing import TypeVar, Generic, List, Optional
+import base64
+import binascii
+import json
+from typing import Any, Dict, TypeVar, Generic, List, Optional
 from pydantic import BaseModel
 from fastapi import Query
+from utils.errors import ValidationError
 
 T = TypeVar('T')
 
@@ -9,29 +13,49 @@ class PaginationParams(BaseModel):
     page_size: int = Query(10, ge=1, le=100, description="Items per page")
     sort_by: Optional[str] = Query(None, description="Field to sort by")
     sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Sort order")
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page; takes precedence over page")
+    include_total: bool = Query(True, description="Count the matching items; when false total and total_pages are null")
 
 class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
+    total: Optional[int]
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int]
     has_next: bool
     has_previous: bool
+    next_cursor: Optional[str] = None
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """ Opaque, URL-safe token for a keyset position """
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        position = None
+    if not isinstance(position, dict):
+        raise ValidationError(message="Invalid pagination cursor", details={"cursor": cursor})
+    return position
 
 def paginate(
     items: List[T],
-    total: int,
-    params: PaginationParams
+    total: Optional[int],
+    params: PaginationParams,
+    next_cursor: Optional[str] = None
 ) -> PaginatedResponse[T]:
-    total_pages = (total + params.page_size - 1) // params.page_size
-    
-    return PaginatedResponse(
+    # Without a total (include_total=false), whether there is a next page comes from the cursor
+    total_pages = (total + params.page_size - 1) // params.page_size if total is not None else None
+
+    # Items come from our own normalization, so skip validating them again
+    return PaginatedResponse.model_construct(
         items=items,
         total=total,
         page=params.page,
         page_size=params.page_size,
         total_pages=total_pages,
-        has_next=params.page < total_pages,
-        has_previous=params.page > 1
-    )
\ No newline at end of file
+        has_next=params.page < total_pages if total_pages is not None and not params.cursor else next_cursor is not None,
+        has_previous=params.page > 1 or params.cursor is not None,
+        next_cursor=next_cursor
+    )
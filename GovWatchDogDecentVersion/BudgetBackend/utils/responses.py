@@ -0,0 +1,75 @@
+import gzip
+import os
+from typing import Any, Dict, Optional
+import orjson
+from fastapi import Request, Response
+from pydantic import BaseModel
+from models.series import Series
+from utils.http_cache import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; compressing them costs more than it saves
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "1"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+def _default(value: Any) -> Any:
+    # Models are flattened one level at a time, so already-normalized items are never re-validated
+    if isinstance(value, BaseModel):
+        return dict(value)
+    # Columnar series become the public per-observation items only here, at the edge
+    if isinstance(value, Series):
+        return value.to_items()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+def _accepted_encodings(request: Request) -> Dict[str, float]:
+    accepted = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    return accepted
+
+def negotiate_encoding(request: Request, size: int) -> Optional[str]:
+    """ br or gzip if the client accepts it and the body is worth compressing, else None """
+    if size < COMPRESSION_MIN_BYTES:
+        return None
+    accepted = _accepted_encodings(request)
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+def fast_json_response(request: Request, content: Any, headers: Optional[Dict[str, str]] = None, status_code: int = 200) -> Response:
+    """
+    JSON response encoded with orjson, bypassing FastAPI's response_model validation and
+    jsonable_encoder, compressed with br/gzip when negotiated and above COMPRESSION_MIN_BYTES.
+    A compressed body's ETag gets the encoding as a suffix, so caches never mix representations.
+    """
+    body = dumps(content)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(request, len(body))
+    if encoding == "br":
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        if "ETag" in headers:
+            headers["ETag"] = encoded_etag(headers["ETag"], encoding)
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -33,7 +33,10 @@ class DataFilter(BaseModel):
 
     @validator('metric')
     def validate_metric(cls, v):
-        valid_metrics = ['gdp_growth', 'inflation_rate', 'employment_growth', 'debt_to_gdp']
+        valid_metrics = [
+            'gdp_growth', 'inflation_rate', 'employment_growth', 'bond_yields', 'nominal_gdp',
+            'debt_to_gdp', 'interest_payments', 'program_spending'
+        ]
         if v and v not in valid_metrics:
             raise ValueError(f"metric must be one of: {', '.join(valid_metrics)}")
         return v
\ No newline at end of file